@@ -1,21 +1,139 @@
+import itertools
+import logging
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from app.core.config import settings
+from app.core.redis import get_async_redis
+from app.core.db_pool import (
+    InstrumentedAsyncQueuePool,
+    InstrumentedQueuePool,
+    instrument_engine,
+)
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def async_database_url(url: str) -> str:
+    """Same database as `url`, reached through the asyncpg driver"""
+    return (
+        make_url(url)
+        .set(drivername="postgresql+asyncpg")
+        .render_as_string(hide_password=False)
+    )
+
 
+# Sync engine for scripts (seeder) and schema management
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_pre_ping=True,
+    poolclass=InstrumentedQueuePool,
+    **pool_options(),
 )
+instrument_engine(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine used by the API
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    poolclass=InstrumentedAsyncQueuePool,
+    **pool_options(),
+)
+instrument_engine(async_engine)
+
+# Objects stay usable after commit; lazy reloads are not possible in async code
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# Optional read replicas, used round-robin for read-only queries
+replica_engines = []
+for replica_url in settings.DATABASE_REPLICA_URLS:
+    replica_engine = create_async_engine(
+        async_database_url(replica_url),
+        poolclass=InstrumentedAsyncQueuePool,
+        **pool_options(),
+    )
+    instrument_engine(replica_engine)
+    replica_engines.append(replica_engine)
+
+replica_sessionmakers = itertools.cycle(
+    [
+        async_sessionmaker(
+            replica_engine,
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+        for replica_engine in replica_engines
+    ]
+    or [AsyncSessionLocal]
+)
+
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_read_db():
+    """Session on the next replica, or the primary when none are configured"""
+    async with next(replica_sessionmakers)() as db:
         yield db
-    finally:
-        db.close()
+
+
+def create_recent_write_key(email: str) -> str:
+    return f"db:recent-write:{email.lower()}"
+
+
+async def mark_recent_write(email: str) -> None:
+    """Send this user's reads to the primary until replicas have caught up"""
+    if not replica_engines:
+        return
+    try:
+        await get_async_redis().set(
+            create_recent_write_key(email),
+            1,
+            ex=settings.DATABASE_READ_YOUR_WRITES_SECONDS,
+        )
+    except Exception as e:
+        logger.error(f"Failed to record recent write for {email}: {e}")
+
+
+async def choose_read_session(
+    email: str, db: AsyncSession, read_db: AsyncSession
+) -> AsyncSession:
+    """
+    `read_db`, unless this user wrote within the read-your-writes window (or
+    that cannot be checked), in which case the primary session `db`.
+    """
+    if not replica_engines:
+        return db
+    try:
+        if await get_async_redis().exists(create_recent_write_key(email)):
+            return db
+    except Exception as e:
+        logger.error(f"Recent write check failed for {email}: {e}")
+        return db
+    return read_db
+
+
+async def close_async_engine() -> None:
+    await async_engine.dispose()
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
@@ -0,0 +1,133 @@
+import bisect
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds, in milliseconds, of the checkout wait histogram buckets
+CHECKOUT_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    """Counters and a checkout wait histogram for one connection pool"""
+
+    def __init__(self):
+        self.waiters = 0
+        self.max_waiters = 0
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_buckets = [0] * (len(CHECKOUT_WAIT_BUCKETS_MS) + 1)
+        self.wait_seconds_total = 0.0
+
+    def observe_wait(self, seconds: float) -> None:
+        bucket = bisect.bisect_left(CHECKOUT_WAIT_BUCKETS_MS, seconds * 1000)
+        self.wait_buckets[bucket] += 1
+        self.wait_seconds_total += seconds
+
+    def histogram(self) -> dict[str, int]:
+        """Cumulative counts per bucket, Prometheus style"""
+        labels = [f"le_{bound}ms" for bound in CHECKOUT_WAIT_BUCKETS_MS] + ["le_inf"]
+        histogram, running = {}, 0
+        for label, count in zip(labels, self.wait_buckets):
+            running += count
+            histogram[label] = running
+        return histogram
+
+
+class InstrumentedPoolMixin:
+    """
+    Times every checkout, including any time spent opening a connection or
+    queued behind a full pool, counts the callers queued right now (those
+    that found no idle connection and no overflow left), and counts
+    checkouts that gave up with a pool timeout. Pool events only fire once
+    a connection is handed out, so this has to wrap `_do_get`, which is
+    private SQLAlchemy API: recheck it when upgrading past the 2.0 series
+    pinned in requirements.txt.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _exhausted(self) -> bool:
+        overflow_left = self._max_overflow < 0 or self.overflow() < self._max_overflow
+        return self.checkedin() == 0 and not overflow_left
+
+    def _do_get(self):
+        metrics = self.metrics
+        waiting = self._exhausted()
+        if waiting:
+            metrics.waiters += 1
+            metrics.max_waiters = max(metrics.max_waiters, metrics.waiters)
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            metrics.checkout_timeouts += 1
+            raise
+        finally:
+            if waiting:
+                metrics.waiters -= 1
+            metrics.observe_wait(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine) -> None:
+    """Count connects, checkouts and invalidations through pool events"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        sync_engine.pool.metrics.connects += 1
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        sync_engine.pool.metrics.checkouts += 1
+
+    @event.listens_for(sync_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        sync_engine.pool.metrics.invalidations += 1
+
+
+def pool_stats(engine) -> dict:
+    pool = getattr(engine, "sync_engine", engine).pool
+    metrics = getattr(pool, "metrics", None)
+    stats = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+    }
+    if metrics is None:
+        return stats
+    waits = sum(metrics.wait_buckets)
+    stats.update(
+        {
+            "waiters": metrics.waiters,
+            "max_waiters": metrics.max_waiters,
+            "checkouts": metrics.checkouts,
+            "checkout_timeouts": metrics.checkout_timeouts,
+            "connects": metrics.connects,
+            "invalidations": metrics.invalidations,
+            "avg_checkout_wait_ms": (
+                metrics.wait_seconds_total / waits * 1000 if waits else 0.0
+            ),
+            "checkout_wait_histogram": metrics.histogram(),
+        }
+    )
+    return stats
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class HashPoolBusyError(Exception):
+    """Raised when the hash pool queue is full and the job was rejected"""
+
+
+class HashPoolTimeoutError(HashPoolBusyError):
+    """Raised when a hash job does not finish within the configured timeout"""
+
+
+class PasswordHashPool:
+    """
+    Bounded process pool for CPU-heavy password hashing.
+
+    Jobs are submitted from the event loop and awaited without blocking it.
+    At most `max_workers + max_queue` jobs may be outstanding at once; any
+    further job is rejected straight away instead of piling up behind a burst.
+    A job counts against that bound until its worker finishes it, even when
+    the caller has already timed out. If a worker process dies, the pool is
+    replaced and the job retried once.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, timeout: float):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self._initializer = None
+        self._initargs: tuple = ()
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._failed = 0
+        self._restarts = 0
+        self._total_seconds = 0.0
+
+    def configure_workers(self, initializer=None, initargs: tuple = ()) -> None:
+        """Set the function each worker process runs once on start"""
+        self._initializer = initializer
+        self._initargs = initargs
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        # spawn avoids forking a process that already runs an event loop
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=self._initializer,
+            initargs=self._initargs,
+        )
+        logger.info(
+            f"Password hash pool started: workers={self.max_workers} "
+            f"max_queue={self.max_queue}"
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        logger.info("Password hash pool stopped.")
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` in a worker process and return its result"""
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            raise HashPoolBusyError("Password hash pool is saturated")
+
+        self._submitted += 1
+        started = time.perf_counter()
+        try:
+            try:
+                result = await self._run_once(fn, args)
+            except BrokenProcessPool:
+                # Hashing is idempotent, so the job can run again on a new pool
+                result = await self._run_once(fn, args)
+            self._completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self._timed_out += 1
+            raise HashPoolTimeoutError("Password hash job timed out")
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._total_seconds += time.perf_counter() - started
+
+    async def _run_once(self, fn, args):
+        self.start()
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+        try:
+            job = executor.submit(fn, *args)
+            self._in_flight += 1
+            job.add_done_callback(lambda _: self._job_done(loop))
+            # A timeout cancels a job still queued; a running one runs to the end
+            return await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except BrokenProcessPool:
+            self._replace(executor)
+            raise
+
+    def _job_done(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Called from the executor's thread: count the job out on the loop
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # the loop has closed
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+
+    def _replace(self, executor: ProcessPoolExecutor) -> None:
+        """Drop a pool a dead worker broke; the next job starts a new one"""
+        if self._executor is not executor:
+            return
+        self._executor = None
+        self._restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+        logger.error("Password hash pool broken by a dead worker, restarting it")
+
+    def stats(self) -> dict:
+        finished = self._completed + self._failed + self._timed_out
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.max_workers),
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "timed_out": self._timed_out,
+            "restarts": self._restarts,
+            "avg_seconds": self._total_seconds / finished if finished else 0.0,
+        }
+
+
+hash_pool = PasswordHashPool(
+    max_workers=settings.HASH_POOL_SIZE or os.cpu_count() or 1,
+    max_queue=settings.HASH_POOL_MAX_QUEUE,
+    timeout=settings.HASH_POOL_TIMEOUT_SECONDS,
+)
+
+
+def get_hash_pool() -> PasswordHashPool:
+    return hash_pool
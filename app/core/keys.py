@@ -0,0 +1,276 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import pathlib
+import threading
+import time
+
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+from app.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "RS256")
+
+KEY_TYPES = {
+    "EdDSA": ed25519.Ed25519PrivateKey,
+    "RS256": rsa.RSAPrivateKey,
+}
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64url_uint(value: int) -> str:
+    return _b64url(value.to_bytes((value.bit_length() + 7) // 8 or 1, "big"))
+
+
+def public_jwk(kid: str, algorithm: str, public_key) -> dict:
+    """Describe a public key as a JWK (RFC 7517 / RFC 8037)"""
+    if algorithm == "EdDSA":
+        raw = public_key.public_bytes(
+            serialization.Encoding.Raw, serialization.PublicFormat.Raw
+        )
+        jwk = {"kty": "OKP", "crv": "Ed25519", "x": _b64url(raw)}
+    else:
+        numbers = public_key.public_numbers()
+        jwk = {"kty": "RSA", "n": _b64url_uint(numbers.n), "e": _b64url_uint(numbers.e)}
+    jwk.update({"kid": kid, "alg": algorithm, "use": "sig"})
+    return jwk
+
+
+class KeySet:
+    """
+    One loaded set of keys and the kid that signs with them. Never changed
+    in place: a reload or a key activation publishes a new KeySet, so a
+    reader holding one sees a consistent kid, key and JWKS.
+    """
+
+    __slots__ = (
+        "signing_kid",
+        "private_keys",
+        "public_keys",
+        "key_mtimes",
+        "jwks",
+        "jwks_etag",
+    )
+
+    def __init__(
+        self,
+        signing_kid: str | None,
+        private_keys: dict,
+        public_keys: dict,
+        key_mtimes: dict[str, float],
+        jwks: bytes,
+        jwks_etag: str,
+    ):
+        self.signing_kid = signing_kid
+        self.private_keys = private_keys
+        self.public_keys = public_keys
+        self.key_mtimes = key_mtimes
+        self.jwks = jwks
+        self.jwks_etag = jwks_etag
+
+    def with_signing_kid(self, signing_kid: str | None) -> "KeySet":
+        return KeySet(
+            signing_kid,
+            self.private_keys,
+            self.public_keys,
+            self.key_mtimes,
+            self.jwks,
+            self.jwks_etag,
+        )
+
+
+class SigningKeyRing:
+    """
+    Private signing keys loaded from a directory of PEM files.
+
+    The file name (without `.pem`) is the key id. Every key in the directory
+    verifies and is published in the JWKS as soon as it is loaded, but a new
+    key only starts signing once its file is `activation_delay` seconds old
+    (by mtime), so services caching the JWKS have fetched it first. The
+    newest key past that age signs; if none is, the oldest key does. A
+    rotation is: drop a new key in, wait out the longest token lifetime
+    after it activates, then delete the old file. The directory is
+    re-scanned at most every `reload_seconds`; once `background` is set,
+    only refresh_keys_periodically() re-scans it, off the event loop.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        algorithm: str,
+        reload_seconds: float,
+        activation_delay: float = 0.0,
+    ):
+        self.directory = pathlib.Path(directory)
+        self.algorithm = algorithm
+        self.reload_seconds = reload_seconds
+        self.activation_delay = activation_delay
+        self.background = False
+        self._lock = threading.Lock()
+        self._fingerprint: tuple = ()
+        self._checked_at = float("-inf")
+        empty_jwks = b'{"keys":[]}'
+        self._keys = KeySet(None, {}, {}, {}, empty_jwks, self._etag(empty_jwks))
+        self._reload_callbacks = []
+
+    def on_reload(self, callback) -> None:
+        """Register a callable to run whenever the key set changes"""
+        self._reload_callbacks.append(callback)
+
+    def refresh(self, force: bool = False) -> None:
+        if self.background and not force:
+            return
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_seconds:
+            return
+        with self._lock:
+            self._checked_at = now
+            paths = sorted(
+                self.directory.glob("*.pem"), key=lambda p: p.stat().st_mtime
+            )
+            fingerprint = tuple((p.name, p.stat().st_mtime_ns) for p in paths)
+            if fingerprint == self._fingerprint:
+                # Same keys, but a published key may now be old enough to sign
+                self._select_signing_key()
+                return
+            self._load(paths)
+            self._fingerprint = fingerprint
+        for callback in self._reload_callbacks:
+            callback()
+
+    def _signing_kid_for(self, key_mtimes: dict[str, float]) -> tuple[str | None, int]:
+        """The kid to sign with, and how many newer keys are not yet active"""
+        activated_before = time.time() - self.activation_delay
+        active = [kid for kid, mtime in key_mtimes.items() if mtime <= activated_before]
+        signing_kid = active[-1] if active else next(iter(key_mtimes), None)
+        return signing_kid, len(key_mtimes) - len(active)
+
+    def _select_signing_key(self) -> None:
+        keys = self._keys
+        signing_kid, pending = self._signing_kid_for(keys.key_mtimes)
+        if signing_kid != keys.signing_kid:
+            self._keys = keys.with_signing_kid(signing_kid)
+            logger.info(
+                f"Signing with kid={signing_kid}, "
+                f"{pending} newer key(s) published but not yet active"
+            )
+
+    def _load(self, paths: list[pathlib.Path]) -> None:
+        private_keys = {}
+        key_mtimes = {}
+        for path in paths:
+            try:
+                key = serialization.load_pem_private_key(
+                    path.read_bytes(), password=None
+                )
+            except (OSError, ValueError, TypeError, UnsupportedAlgorithm) as e:
+                logger.error(f"Skipping key {path.name}: {e}")
+                continue
+            if not isinstance(key, KEY_TYPES[self.algorithm]):
+                logger.error(f"Skipping key {path.name}: not a {self.algorithm} key")
+                continue
+            private_keys[path.stem] = key
+            key_mtimes[path.stem] = path.stat().st_mtime
+
+        public_keys = {kid: key.public_key() for kid, key in private_keys.items()}
+        jwks = json.dumps(
+            {
+                "keys": [
+                    public_jwk(kid, self.algorithm, key)
+                    for kid, key in public_keys.items()
+                ]
+            },
+            separators=(",", ":"),
+        ).encode()
+        signing_kid, pending = self._signing_kid_for(key_mtimes)
+        # Publish the whole set at once: readers never see a kid without its key
+        self._keys = KeySet(
+            signing_kid,
+            private_keys,
+            public_keys,
+            key_mtimes,
+            jwks,
+            self._etag(jwks),
+        )
+        logger.info(
+            f"Loaded {len(private_keys)} {self.algorithm} key(s), "
+            f"signing kid={signing_kid}, {pending} not yet active"
+        )
+
+    @staticmethod
+    def _etag(document: bytes) -> str:
+        return '"' + hashlib.sha256(document).hexdigest()[:32] + '"'
+
+    def signing_key(self) -> tuple[str, object]:
+        self.refresh()
+        keys = self._keys
+        if keys.signing_kid is None:
+            raise RuntimeError(f"No {self.algorithm} signing keys in {self.directory}")
+        return keys.signing_kid, keys.private_keys[keys.signing_kid]
+
+    def public_key(self, kid: str):
+        self.refresh()
+        return self._keys.public_keys.get(kid)
+
+    def jwks(self) -> tuple[bytes, str]:
+        """Serialized JWKS document and its ETag"""
+        self.refresh()
+        keys = self._keys
+        return keys.jwks, keys.jwks_etag
+
+
+def key_activation_delay() -> float:
+    """
+    How long a new key is only published before it signs: long enough for
+    every worker to load it and for every cached copy of the JWKS to expire
+    """
+    return settings.JWKS_MAX_AGE_SECONDS + settings.JWT_KEYS_RELOAD_SECONDS
+
+
+# Only asymmetric algorithms have keys to publish; HS256 secrets never leave
+key_ring = (
+    SigningKeyRing(
+        directory=settings.JWT_KEYS_DIR,
+        algorithm=settings.ALGORITHM,
+        reload_seconds=settings.JWT_KEYS_RELOAD_SECONDS,
+        activation_delay=key_activation_delay(),
+    )
+    if settings.ALGORITHM in ASYMMETRIC_ALGORITHMS
+    else None
+)
+
+
+def get_key_ring() -> SigningKeyRing | None:
+    return key_ring
+
+
+async def load_signing_keys(ring: SigningKeyRing) -> None:
+    """Load the keys, raising if none of them can sign"""
+    await asyncio.to_thread(ring.refresh, True)
+    ring.signing_key()
+
+
+async def refresh_keys_periodically(ring: SigningKeyRing) -> None:
+    """
+    Re-scan the key directory in a thread, so requests never wait on the disk.
+    Start it once load_signing_keys() has succeeded.
+    """
+    ring.background = True
+    try:
+        while True:
+            await asyncio.sleep(ring.reload_seconds)
+            try:
+                await asyncio.to_thread(ring.refresh, True)
+            except Exception as e:
+                logger.error(f"Reloading signing keys failed: {e}")
+    finally:
+        ring.background = False
@@ -0,0 +1,153 @@
+import os
+import time
+from contextlib import nullcontext
+
+from app.core.config import settings
+
+# prometheus_client picks where samples live when it is imported: with a
+# multiprocess directory, every worker (and the email worker) writes to mmap
+# files there, and /metrics adds them up
+if settings.PROMETHEUS_MULTIPROC_DIR:
+    os.makedirs(settings.PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = settings.PROMETHEUS_MULTIPROC_DIR
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "cartify_http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    ["method", "route", "status"],
+    buckets=REQUEST_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "cartify_stage_duration_seconds",
+    "Time spent in one stage of an operation: hashing, a query, a Redis call, an SMTP send",
+    ["operation", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+
+# Pool usage, sampled by app/core/pool_usage.py; summed over live workers
+DB_POOL_CONNECTIONS = Gauge(
+    "cartify_db_pool_connections",
+    "Database pool connections by state",
+    ["pool", "state"],
+    multiprocess_mode="livesum",
+)
+REDIS_POOL_CONNECTIONS = Gauge(
+    "cartify_redis_pool_connections",
+    "Async Redis pool connections by state",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+SMTP_POOL_CONNECTIONS = Gauge(
+    "cartify_smtp_pool_connections",
+    "SMTP pool connections by state",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+HASH_POOL_TASKS = Gauge(
+    "cartify_hash_pool_tasks",
+    "Password hashing process pool: workers, and tasks running or queued",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+THREAD_POOL_THREADS = Gauge(
+    "cartify_thread_pool_threads",
+    "Threads running sync endpoints and dependencies, borrowed or total",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+
+
+def is_multiprocess() -> bool:
+    return bool(settings.PROMETHEUS_MULTIPROC_DIR)
+
+
+# Labelled children by (operation, stage): labels() takes a lock on every call
+stage_histograms: dict[tuple[str, str], Histogram] = {}
+
+
+def stage_timer(operation: str, stage: str):
+    """Context manager timing one stage of `operation` into STAGE_SECONDS"""
+    if not settings.METRICS_ENABLED:
+        return nullcontext()
+    histogram = stage_histograms.get((operation, stage))
+    if histogram is None:
+        histogram = STAGE_SECONDS.labels(operation, stage)
+        stage_histograms[(operation, stage)] = histogram
+    return histogram.time()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """The exposition text for /metrics, and its content type"""
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead() -> None:
+    """Drop this process's live gauges from the multiprocess directory"""
+    if is_multiprocess():
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request into HTTP_REQUEST_SECONDS. Requests are labelled
+    by route template (/auth/login, not the raw path) so the label set stays
+    bounded; anything that matched no route is "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route in the scope
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status_code,
+            ).observe(time.perf_counter() - started)
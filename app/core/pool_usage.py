@@ -0,0 +1,65 @@
+import asyncio
+import logging
+
+from anyio import to_thread
+
+from app.core.config import settings
+from app.core.database import async_engine, replica_engines
+from app.core.db_pool import pool_stats
+from app.core.hash_pool import get_hash_pool
+from app.core.metrics import (
+    DB_POOL_CONNECTIONS,
+    HASH_POOL_TASKS,
+    REDIS_POOL_CONNECTIONS,
+    SMTP_POOL_CONNECTIONS,
+    THREAD_POOL_THREADS,
+)
+from app.core.redis import get_async_redis
+from app.utils.smtp_pool import get_smtp_pool
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def record_pool_usage() -> None:
+    """Sample this worker's connection, process and thread pools into gauges"""
+    engines = [("primary", async_engine)] + [
+        (f"replica{i}", engine) for i, engine in enumerate(replica_engines)
+    ]
+    for name, engine in engines:
+        stats = pool_stats(engine)
+        for state in ("size", "checked_out", "checked_in", "overflow", "waiters"):
+            if state in stats:
+                DB_POOL_CONNECTIONS.labels(name, state).set(stats[state])
+
+    # Cluster clients keep a pool per node and have no single pool to read
+    redis_pool = getattr(get_async_redis(), "connection_pool", None)
+    if redis_pool is not None:
+        REDIS_POOL_CONNECTIONS.labels("in_use").set(
+            len(getattr(redis_pool, "_in_use_connections", ()))
+        )
+        REDIS_POOL_CONNECTIONS.labels("idle").set(
+            len(getattr(redis_pool, "_available_connections", ()))
+        )
+        REDIS_POOL_CONNECTIONS.labels("max").set(redis_pool.max_connections)
+
+    smtp = get_smtp_pool().stats()
+    for state in ("size", "in_use", "idle"):
+        SMTP_POOL_CONNECTIONS.labels(state).set(smtp[state])
+
+    hashing = get_hash_pool().stats()
+    for state in ("workers", "in_flight", "queued"):
+        HASH_POOL_TASKS.labels(state).set(hashing[state])
+
+    limiter = to_thread.current_default_thread_limiter()
+    THREAD_POOL_THREADS.labels("borrowed").set(limiter.borrowed_tokens)
+    THREAD_POOL_THREADS.labels("total").set(limiter.total_tokens)
+
+
+async def record_pool_usage_periodically() -> None:
+    """Keep the pool gauges fresh between scrapes, for as long as the app runs"""
+    while True:
+        try:
+            record_pool_usage()
+        except Exception as e:
+            logger.error(f"Recording pool usage failed: {e}")
+        await asyncio.sleep(settings.METRICS_REFRESH_SECONDS)
@@ -0,0 +1,372 @@
+import asyncio
+import hmac
+import itertools
+import json
+import logging
+import os
+import pathlib
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from app.core.config import settings
+from app.core.redis import get_async_redis, listen
+
+logger = logging.getLogger("uvicorn.error")
+
+PROFILE_FORMATS = {"collapsed": ".collapsed.txt", "speedscope": ".speedscope.json"}
+
+# Every change to the profiling toggle is published here so all workers apply it
+PROFILING_CHANNEL = "debug:profiling"
+
+
+class StackSampler:
+    """
+    Statistical profiler: a background thread records the Python stack of one
+    thread every `interval` seconds. Samples taken while an asyncio event
+    loop sits idle in select() are counted as idle rather than kept, so the
+    stacks show where the loop spent CPU. (uvloop waits in C, so there its
+    idle samples show as the loop's outermost Python frame instead.)
+
+    The sampler needs the GIL to take a sample, so under CPU-bound load the
+    effective rate is bounded by sys.getswitchinterval() (5 ms by default).
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[tuple] = Counter()
+        self.idle_samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            if frame.f_code.co_filename.endswith("selectors.py"):
+                self.idle_samples += 1
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    (
+                        getattr(code, "co_qualname", code.co_name),
+                        code.co_filename,
+                        code.co_firstlineno,
+                    )
+                )
+                frame = frame.f_back
+            stack.reverse()
+            self.samples[tuple(stack)] += 1
+
+
+def frame_label(frame: tuple) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed_stacks(sampler: StackSampler) -> str:
+    """One "root;...;leaf count" line per distinct stack, for flamegraph tools"""
+    lines = [
+        f"{';'.join(frame_label(frame) for frame in stack)} {count}"
+        for stack, count in sampler.samples.most_common()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def speedscope_profile(sampler: StackSampler, name: str) -> str:
+    """The samples as a speedscope "sampled" profile (https://www.speedscope.app)"""
+    frame_index: dict[tuple, int] = {}
+    frames = []
+    samples = []
+    weights = []
+    weight = sampler.interval * 1000
+    for stack, count in sampler.samples.items():
+        indexes = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            indexes.append(frame_index[frame])
+        samples.append(indexes)
+        weights.append(count * weight)
+    document = {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "exporter": "cartify",
+        "name": name,
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+        ],
+    }
+    return json.dumps(document)
+
+
+class ProfilingState:
+    """This worker's profiling toggle and bookkeeping"""
+
+    def __init__(self):
+        self.sample_every = settings.PROFILING_SAMPLE_EVERY
+        self.format = settings.PROFILING_FORMAT
+        self.requests = 0
+        self.active: StackSampler | None = None
+        self.profiles = 0
+        self.skipped_busy = 0
+
+    def apply(self, sample_every: int, profile_format: str) -> None:
+        self.sample_every = max(0, sample_every)
+        self.format = profile_format
+        logger.info(
+            f"Profiling set to 1 in {self.sample_every} requests "
+            f"({self.format}) in worker {os.getpid()}"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "sample_every": self.sample_every,
+            "format": self.format,
+            "profiling_now": self.active is not None,
+            "profiles": self.profiles,
+            "skipped_busy": self.skipped_busy,
+        }
+
+
+profiling_state = ProfilingState()
+profile_ids = itertools.count(1)
+
+
+def profiles_dir() -> pathlib.Path:
+    return pathlib.Path(settings.PROFILING_DIR)
+
+
+def list_profiles() -> list[str]:
+    """Saved profile file names, newest first"""
+    directory = profiles_dir()
+    if not directory.is_dir():
+        return []
+    files = [path for path in directory.iterdir() if path.is_file()]
+    files.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+    return [path.name for path in files]
+
+
+def save_profile(profile_id: str, profile_format: str, sampler, title: str) -> str:
+    directory = profiles_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    filename = profile_id + PROFILE_FORMATS[profile_format]
+    if profile_format == "speedscope":
+        content = speedscope_profile(sampler, title)
+    else:
+        content = collapsed_stacks(sampler)
+    (directory / filename).write_text(content)
+    for stale in list_profiles()[settings.PROFILING_KEEP :]:
+        (directory / stale).unlink(missing_ok=True)
+    return filename
+
+
+def header_value(scope, name: bytes) -> bytes | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+def requested_profile_format(scope) -> str | None:
+    """The format to profile this request in, or None to leave it alone"""
+    state = profiling_state
+    if settings.PROFILING_TOKEN:
+        token = header_value(scope, b"x-profile")
+        if token is not None and hmac.compare_digest(
+            token, settings.PROFILING_TOKEN.encode()
+        ):
+            requested = header_value(scope, b"x-profile-format")
+            if requested is not None:
+                requested = requested.decode("latin-1")
+                if requested in PROFILE_FORMATS:
+                    return requested
+            return state.format
+    if state.sample_every:
+        state.requests += 1
+        if state.requests % state.sample_every == 0:
+            return state.format
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a request when it carries `X-Profile: <PROFILING_TOKEN>`, or as
+    1 in every `sample_every` requests, and otherwise only checks those two
+    settings. The profile is written to PROFILING_DIR and its file name is
+    returned in the X-Profile-Id response header.
+
+    The samples cover the event loop thread for as long as the request runs,
+    so work done meanwhile for other requests on this worker shows up too.
+    One request per worker is profiled at a time.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile_format = requested_profile_format(scope)
+        if profile_format is None:
+            await self.app(scope, receive, send)
+            return
+        state = profiling_state
+        if state.active is not None:
+            state.skipped_busy += 1
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{int(time.time() * 1000)}-{os.getpid()}-{next(profile_ids)}"
+        filename = profile_id + PROFILE_FORMATS[profile_format]
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-profile-id", filename.encode()),
+                ]
+            await send(message)
+
+        sampler = StackSampler(
+            threading.get_ident(), settings.PROFILING_INTERVAL_MS / 1000
+        )
+        state.active = sampler
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            state.active = None
+            state.profiles += 1
+            title = f"{scope['method']} {scope['path']}"
+            try:
+                # Serializing, writing and pruning would stall the loop it measures
+                await asyncio.to_thread(
+                    save_profile, profile_id, profile_format, sampler, title
+                )
+                logger.info(
+                    f"Profiled {title} in {sampler.elapsed * 1000:.1f} ms: "
+                    f"{sum(sampler.samples.values())} samples, "
+                    f"{sampler.idle_samples} idle -> {filename}"
+                )
+            except Exception as e:
+                logger.error(f"Saving profile {filename} failed: {e}")
+
+
+async def publish_profiling_settings(sample_every: int, profile_format: str) -> None:
+    """Apply the profiling toggle here and in every other worker"""
+    profiling_state.apply(sample_every, profile_format)
+    await get_async_redis().publish(
+        PROFILING_CHANNEL,
+        json.dumps({"sample_every": sample_every, "format": profile_format}),
+    )
+
+
+def apply_published_settings(data: str) -> None:
+    change = json.loads(data)
+    profiling_state.apply(change["sample_every"], change["format"])
+
+
+async def listen_for_profiling_changes() -> None:
+    """Apply toggles published on PROFILING_CHANNEL, for as long as the app runs"""
+    await listen(PROFILING_CHANNEL, apply_published_settings)
+
+
+# The previous snapshot taken in this worker, which the next one is diffed against
+memory_snapshot: tracemalloc.Snapshot | None = None
+
+MEMORY_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def start_memory_tracing(frames: int) -> None:
+    global memory_snapshot
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        memory_snapshot = None
+        logger.info(f"tracemalloc started in worker {os.getpid()}")
+
+
+def stop_memory_tracing() -> None:
+    global memory_snapshot
+    tracemalloc.stop()
+    memory_snapshot = None
+    logger.info(f"tracemalloc stopped in worker {os.getpid()}")
+
+
+def describe_statistic(stat) -> dict:
+    frame = stat.traceback[0]
+    described = {
+        "location": f"{frame.filename}:{frame.lineno}",
+        "size_kib": round(stat.size / 1024, 1),
+        "count": stat.count,
+    }
+    if isinstance(stat, tracemalloc.StatisticDiff):
+        described["size_diff_kib"] = round(stat.size_diff / 1024, 1)
+        described["count_diff"] = stat.count_diff
+    return described
+
+
+def memory_report(limit: int, group_by: str) -> dict:
+    """
+    Top allocation sites now, and the sites that grew most since the previous
+    report from this worker. Slow on a large heap: run it off the event loop.
+    """
+    global memory_snapshot
+    snapshot = tracemalloc.take_snapshot().filter_traces(MEMORY_SNAPSHOT_FILTERS)
+    previous, memory_snapshot = memory_snapshot, snapshot
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "pid": os.getpid(),
+        "traced_kib": round(current / 1024, 1),
+        "peak_kib": round(peak / 1024, 1),
+        "top": [
+            describe_statistic(stat) for stat in snapshot.statistics(group_by)[:limit]
+        ],
+        "growth": (
+            [
+                describe_statistic(stat)
+                for stat in snapshot.compare_to(previous, group_by)[:limit]
+            ]
+            if previous is not None
+            else None
+        ),
+    }
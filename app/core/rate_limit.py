@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.redis import get_async_redis, is_redis_cluster
+
+logger = logging.getLogger("uvicorn.error")
+
+# Sliding-window counter over two fixed windows per rule: the previous
+# window's count is weighted by how much of it still overlaps the sliding
+# window. Every rule is checked before any is charged, so a request rejected
+# by one rule does not use up the others.
+#
+# KEYS: current, previous window key per rule
+# ARGV: limit, window_ms, elapsed_ms per rule
+# Returns 0 when allowed, otherwise milliseconds until a retry can succeed.
+SLIDING_WINDOW_SCRIPT = """
+local retry_ms = 0
+local rules = #KEYS / 2
+for i = 1, rules do
+    local limit = tonumber(ARGV[i * 3 - 2])
+    local window = tonumber(ARGV[i * 3 - 1])
+    local elapsed = tonumber(ARGV[i * 3])
+    local current = tonumber(redis.call('GET', KEYS[i * 2 - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[i * 2]) or '0')
+    local estimate = previous * (window - elapsed) / window + current
+    if estimate + 1 > limit then
+        local wait
+        if current + 1 > limit then
+            -- blocked until this window is old enough to count for less
+            wait = window - elapsed + window * (1 - (limit - 1) / current)
+        else
+            wait = window * (1 - (limit - current - 1) / previous) - elapsed
+        end
+        retry_ms = math.max(retry_ms, wait, 1)
+    end
+end
+if retry_ms > 0 then
+    return math.ceil(retry_ms)
+end
+for i = 1, rules do
+    redis.call('INCR', KEYS[i * 2 - 1])
+    redis.call('PEXPIRE', KEYS[i * 2 - 1], tonumber(ARGV[i * 3 - 1]) * 2)
+end
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    name: str  # "ip", "email" or "global"
+    limit: int
+    window_seconds: int
+
+
+def default_rules() -> list[RateLimitRule]:
+    return [
+        RateLimitRule(
+            "ip", settings.RATE_LIMIT_PER_IP, settings.RATE_LIMIT_WINDOW_SECONDS
+        ),
+        RateLimitRule(
+            "email", settings.RATE_LIMIT_PER_EMAIL, settings.RATE_LIMIT_WINDOW_SECONDS
+        ),
+        RateLimitRule("global", settings.RATE_LIMIT_GLOBAL_PER_SECOND, 1),
+    ]
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def request_email(request: Request) -> str | None:
+    """Email from the JSON body; FastAPI caches the body, so this is a reread"""
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    email = body.get("email") if isinstance(body, dict) else None
+    # Cap the length: this runs before validation and becomes a Redis key
+    return email.strip().lower()[:254] if isinstance(email, str) else None
+
+
+async def check_rate_limit(scope: str, identities: dict[str, str | None]) -> int:
+    """
+    Charge one request against every rule with an identity. Returns 0 if
+    allowed, otherwise the seconds to wait before retrying.
+
+    On Redis Cluster each rule's keys hash to their own slot, so rules are
+    checked by separate concurrent script calls; a request rejected by one
+    rule is then still charged to the others.
+    """
+    groups = []
+    now_ms = int(time.time() * 1000)
+    for rule in default_rules():
+        identity = identities.get(rule.name)
+        if identity is None or rule.limit <= 0:
+            continue
+        window_ms = rule.window_seconds * 1000
+        index = now_ms // window_ms
+        # Hash tag keeps both windows of a rule in the same cluster slot
+        base = f"ratelimit:{{{scope}:{rule.name}:{identity}}}"
+        groups.append(
+            (
+                [f"{base}:{index}", f"{base}:{index - 1}"],
+                [rule.limit, window_ms, now_ms - index * window_ms],
+            )
+        )
+    if not groups:
+        return 0
+
+    sliding_window = get_async_redis().register_script(SLIDING_WINDOW_SCRIPT)
+    if is_redis_cluster():
+        replies = await asyncio.gather(
+            *(sliding_window(keys=keys, args=args) for keys, args in groups)
+        )
+        retry_ms = max(int(reply) for reply in replies)
+    else:
+        keys = [key for group_keys, _ in groups for key in group_keys]
+        args = [arg for _, group_args in groups for arg in group_args]
+        retry_ms = int(await sliding_window(keys=keys, args=args))
+    return math.ceil(retry_ms / 1000)
+
+
+def rate_limit(scope: str):
+    """
+    FastAPI dependency limiting a route per client IP, per email in the
+    request body and globally. It runs before the handler, so a rejected
+    request never reaches hashing, the database or SMTP.
+    """
+
+    async def dependency(request: Request) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        identities = {
+            "ip": client_ip(request),
+            "email": await request_email(request),
+            "global": "all",
+        }
+        try:
+            retry_after = await check_rate_limit(scope, identities)
+        except Exception as e:
+            # Fail open: a Redis outage should not lock every user out
+            logger.error(f"Rate limit check failed for {scope}: {e}")
+            return
+        if retry_after:
+            logger.warning(f"Rate limited {scope}: ip={identities['ip']}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please try again later",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+    return dependency
@@ -1,27 +1,176 @@
-import redis
+import asyncio
+import redis.asyncio as aioredis
+from redis.asyncio.cluster import ClusterNode as AsyncClusterNode
+from redis.asyncio.cluster import RedisCluster as AsyncRedisCluster
+from redis.asyncio.sentinel import Sentinel as AsyncSentinel
+from redis.cluster import LoadBalancingStrategy
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger("uvicorn.error")
 
-redis_client = redis.Redis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    db=settings.REDIS_DB,
-    password=settings.REDIS_PASSWORD,
-    decode_responses=True,
-)
 
+def parse_nodes(nodes: list[str]) -> list[tuple[str, int]]:
+    """Turn ["host:port", ...] into [(host, port), ...]"""
+    parsed = []
+    for node in nodes:
+        host, _, port = node.rpartition(":")
+        parsed.append((host, int(port)))
+    return parsed
 
-def get_redis():
-    return redis_client
 
+def is_redis_cluster() -> bool:
+    return settings.REDIS_MODE == "cluster"
 
-def ping_redis() -> bool:
+
+def connection_kwargs() -> dict:
+    return {
+        "password": settings.REDIS_PASSWORD,
+        "decode_responses": True,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+    }
+
+
+def sentinel_kwargs() -> dict:
+    return (
+        {"password": settings.REDIS_SENTINEL_PASSWORD}
+        if settings.REDIS_SENTINEL_PASSWORD
+        else {}
+    )
+
+
+# Created on first use: a cluster client connects as soon as it is built
+async_redis_client = None
+async_redis_reader = None
+async_pubsub_client = None
+
+
+def create_async_redis(replica: bool = False):
+    """
+    Async client for the configured topology. With `replica`, reads are
+    served by replicas: a Sentinel-discovered replica, or cluster replicas
+    round-robin.
+    """
+    if settings.REDIS_MODE == "sentinel":
+        sentinel = AsyncSentinel(
+            parse_nodes(settings.REDIS_SENTINELS),
+            sentinel_kwargs=sentinel_kwargs(),
+            **connection_kwargs(),
+        )
+        connect = sentinel.slave_for if replica else sentinel.master_for
+        return connect(
+            settings.REDIS_SENTINEL_MASTER,
+            db=settings.REDIS_DB,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+        )
+    if settings.REDIS_MODE == "cluster":
+        return AsyncRedisCluster(
+            startup_nodes=[
+                AsyncClusterNode(host, port)
+                for host, port in parse_nodes(settings.REDIS_CLUSTER_NODES)
+            ],
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            load_balancing_strategy=(
+                LoadBalancingStrategy.ROUND_ROBIN_REPLICAS if replica else None
+            ),
+            **connection_kwargs(),
+        )
+    # Blocking pool: when every connection is busy, wait for one instead of failing
+    pool = aioredis.BlockingConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        **connection_kwargs(),
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+def get_async_redis():
+    global async_redis_client
+    if async_redis_client is None:
+        async_redis_client = create_async_redis()
+    return async_redis_client
+
+
+def get_async_redis_reader():
+    """
+    Client for read-only paths. Replicas when REDIS_READ_FROM_REPLICAS is set
+    (and there are any to read from), otherwise the primary client. Replica
+    reads may lag the primary slightly.
+    """
+    global async_redis_reader
+    if not settings.REDIS_READ_FROM_REPLICAS or settings.REDIS_MODE == "standalone":
+        return get_async_redis()
+    if async_redis_reader is None:
+        async_redis_reader = create_async_redis(replica=True)
+    return async_redis_reader
+
+
+def get_async_pubsub_redis():
+    """
+    Client for pub/sub. The async cluster client has no pub/sub, but cluster
+    PUBLISH reaches every node, so any single node will do.
+    """
+    global async_pubsub_client
+    if not is_redis_cluster():
+        return get_async_redis()
+    if async_pubsub_client is None:
+        host, port = parse_nodes(settings.REDIS_CLUSTER_NODES)[0]
+        async_pubsub_client = aioredis.Redis(
+            host=host, port=port, **connection_kwargs()
+        )
+    return async_pubsub_client
+
+
+async def close_async_redis() -> None:
+    global async_redis_client, async_redis_reader, async_pubsub_client
+    for client in {
+        id(c): c
+        for c in (async_redis_client, async_redis_reader, async_pubsub_client)
+        if c
+    }.values():
+        await client.aclose()
+    if async_redis_client is not None:
+        logger.info("Redis connection pool closed.")
+    async_redis_client = async_redis_reader = async_pubsub_client = None
+
+
+async def ping_redis_async() -> bool:
     try:
-        redis_client.ping()
+        await get_async_redis().ping()
         logger.info("Redis connection successful.")
         return True
     except Exception as e:
         logger.error(f"Redis connection failed: {e}")
         return False
+
+
+async def listen(channel: str, handle, on_reset=None) -> None:
+    """
+    Call `handle` with every message published on `channel`, for as long as
+    the app runs, resubscribing after errors. Anything published while
+    disconnected is lost, so `on_reset` runs on every (re)subscribe and error.
+    """
+    while True:
+        try:
+            async with get_async_pubsub_redis().pubsub() as pubsub:
+                await pubsub.subscribe(channel)
+                if on_reset is not None:
+                    on_reset()
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message is not None:
+                        handle(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if on_reset is not None:
+                on_reset()
+            logger.error(f"Listener on {channel} failed, retrying: {e}")
+            await asyncio.sleep(1)
@@ -0,0 +1,25 @@
+import pathlib
+from functools import lru_cache
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+ALEMBIC_INI = pathlib.Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+@lru_cache
+def expected_schema_revision() -> str | None:
+    """Head revision of the migrations shipped with this code (no DB access)"""
+    return ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_current_head()
+
+
+async def current_schema_revision(conn: AsyncConnection) -> str | None:
+    """Revision the database was migrated to, None if it never was"""
+    try:
+        result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+    except DBAPIError:
+        return None
+    return result.scalar()
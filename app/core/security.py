@@ -1,12 +1,93 @@
 from passlib.context import CryptContext
+from passlib.hash import pbkdf2_sha256
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
 from jose import jwt, JWTError
-from datetime import datetime, timedelta
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError
+from datetime import timedelta
 from app.core.config import settings
+from app.core.hash_pool import get_hash_pool
+from app.core.keys import ASYMMETRIC_ALGORITHMS, SigningKeyRing, get_key_ring
+from app.utils.cache import TTLCache
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+
+logger = logging.getLogger("uvicorn.error")
 
 # Use pbkdf2_sha256 instead of bcrypt to avoid compatibility issues
 # and the 72-byte password limit
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
+MIN_HASH_ROUNDS = 10000
+CALIBRATION_SAMPLE_ROUNDS = 20000
+# Calibrated rounds are rounded to this, so workers measuring slightly
+# different timings still mostly agree on the same policy
+CALIBRATION_ROUNDS_STEP = 10000
+
+
+def calibrate_hash_rounds(target_ms: float) -> int:
+    """Measure pbkdf2 on this machine and pick rounds that take about target_ms"""
+    handler = pbkdf2_sha256.using(rounds=CALIBRATION_SAMPLE_ROUNDS)
+    best = min(_time_hash(handler) for _ in range(3))
+    rounds = CALIBRATION_SAMPLE_ROUNDS * (target_ms / 1000) / best
+    rounds = round(rounds / CALIBRATION_ROUNDS_STEP) * CALIBRATION_ROUNDS_STEP
+    return max(MIN_HASH_ROUNDS, rounds)
+
+
+def _time_hash(handler) -> float:
+    started = time.perf_counter()
+    handler.hash("calibration-probe")
+    return time.perf_counter() - started
+
+
+def resolve_hash_rounds() -> int | None:
+    """Return the rounds policy from settings, calibrating if enabled"""
+    if settings.PASSWORD_HASH_ROUNDS:
+        return settings.PASSWORD_HASH_ROUNDS
+    if settings.PASSWORD_HASH_CALIBRATE:
+        rounds = calibrate_hash_rounds(settings.PASSWORD_HASH_TARGET_MS)
+        logger.info(
+            f"Calibrated pbkdf2 rounds={rounds} "
+            f"for target={settings.PASSWORD_HASH_TARGET_MS}ms"
+        )
+        return rounds
+    return None
+
+
+def configure_hash_policy(rounds: int | None) -> None:
+    """
+    Hash new passwords with `rounds`. Stored hashes report needs_update, and
+    get rehashed on the next successful login, only when their rounds are
+    outside PASSWORD_HASH_ROUNDS_TOLERANCE of it, so workers or deploys that
+    calibrate a little differently do not rehash on every login.
+    """
+    if rounds is None:
+        return
+    tolerance = settings.PASSWORD_HASH_ROUNDS_TOLERANCE
+    pwd_context.update(
+        pbkdf2_sha256__default_rounds=rounds,
+        pbkdf2_sha256__min_rounds=max(MIN_HASH_ROUNDS, int(rounds * (1 - tolerance))),
+        pbkdf2_sha256__max_rounds=int(rounds * (1 + tolerance)),
+    )
+
+
+def is_password_hash(hashed_password: str | None) -> bool:
+    """Check that a stored value is a hash this context can verify"""
+    if not hashed_password:
+        return False
+    return pwd_context.identify(hashed_password, required=False) is not None
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    return pwd_context.needs_update(hashed_password)
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -16,42 +97,256 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(
-            minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
+async def hash_password_async(password: str) -> str:
+    """Hash a password in the hash process pool without blocking the event loop"""
+    return await get_hash_pool().run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the hash process pool without blocking the event loop"""
+    return await get_hash_pool().run(verify_password, plain_password, hashed_password)
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _encode_json(value: dict) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _validate_claims(claims: dict) -> None:
+    """The registered-claim checks python-jose applies with default options"""
+    now = time.time()
+    exp = claims.get("exp")
+    if exp is not None:
+        if not isinstance(exp, (int, float)):
+            raise JWTClaimsError("Expiration Time claim (exp) must be an integer.")
+        if exp < now:
+            raise ExpiredSignatureError("Signature has expired.")
+    nbf = claims.get("nbf")
+    if nbf is not None:
+        if not isinstance(nbf, (int, float)):
+            raise JWTClaimsError("Not Before claim (nbf) must be an integer.")
+        if nbf > now:
+            raise JWTClaimsError("The token is not yet valid (nbf)")
+    if "iat" in claims and not isinstance(claims["iat"], (int, float)):
+        raise JWTClaimsError("Issued At claim (iat) must be an integer.")
+    if "aud" in claims:
+        # We never issue audiences, so any aud claim is not meant for us
+        raise JWTClaimsError("Invalid audience")
+    if "sub" in claims and not isinstance(claims["sub"], str):
+        raise JWTClaimsError("Subject must be a string.")
+
+
+class JoseTokenCodec:
+    """Generic python-jose encode/decode for any configured algorithm"""
+
+    def __init__(self, key, algorithm: str):
+        self.key = key
+        self.algorithm = algorithm
+
+    def encode(self, claims: dict) -> str:
+        return jwt.encode(claims, self.key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        return jwt.decode(token, self.key, algorithms=[self.algorithm])
+
+
+def _split_token(token: str) -> tuple[bytes, bytes, bytes, bytes]:
+    """Split a compact JWS into signing input, header, payload and signature"""
+    signing_input, _, signature_segment = token.encode().rpartition(b".")
+    header_segment, _, payload_segment = signing_input.partition(b".")
+    if not payload_segment:
+        raise JWTError("Not enough segments")
+    try:
+        signature = _b64decode(signature_segment)
+    except (binascii.Error, ValueError):
+        raise JWTError("Invalid crypto padding")
+    return signing_input, header_segment, payload_segment, signature
+
+
+def _load_segment(segment: bytes) -> dict:
+    try:
+        value = json.loads(_b64decode(segment))
+    except (binascii.Error, ValueError, UnicodeError):
+        raise JWTError("Invalid token encoding")
+    if not isinstance(value, dict):
+        raise JWTError("Invalid segment: must be a json object")
+    return value
+
+
+def _load_claims(payload_segment: bytes) -> dict:
+    claims = _load_segment(payload_segment)
+    _validate_claims(claims)
+    return claims
+
+
+class HS256TokenCodec:
+    """
+    HS256 JWT codec with the header segment and HMAC key schedule built once.
+
+    Produces and accepts the same compact tokens as python-jose: the header
+    is serialized with sorted keys, the payload compactly, both unpadded
+    base64url.
+    """
+
+    algorithm = "HS256"
+
+    def __init__(self, secret: str):
+        self._mac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+        self._header_segment = _b64encode(
+            json.dumps(
+                {"alg": self.algorithm, "typ": "JWT"},
+                separators=(",", ":"),
+                sort_keys=True,
+            ).encode()
         )
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(
-        to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
+
+    def encode(self, claims: dict) -> str:
+        signing_input = self._header_segment + b"." + _b64encode(_encode_json(claims))
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return (signing_input + b"." + _b64encode(mac.digest())).decode()
+
+    def decode(self, token: str) -> dict:
+        signing_input, header_segment, payload_segment, signature = _split_token(token)
+        if header_segment != self._header_segment:
+            if _load_segment(header_segment).get("alg") != self.algorithm:
+                raise JWTError("The specified alg value is not allowed")
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        if not hmac.compare_digest(mac.digest(), signature):
+            raise JWTError("Signature verification failed.")
+        return _load_claims(payload_segment)
+
+
+class AsymmetricTokenCodec:
+    """
+    EdDSA (Ed25519) or RS256 JWT codec signing with the key ring's active key.
+
+    Tokens carry a `kid` header so other services can verify them locally
+    against /.well-known/jwks.json. Header segments are built once per key id.
+    """
+
+    def __init__(self, key_ring: SigningKeyRing):
+        self.key_ring = key_ring
+        self.algorithm = key_ring.algorithm
+        self._header_segments: dict[str, bytes] = {}
+        self._kids_by_header: dict[bytes, str] = {}
+
+    def _header_segment(self, kid: str) -> bytes:
+        segment = self._header_segments.get(kid)
+        if segment is None:
+            segment = _b64encode(
+                json.dumps(
+                    {"alg": self.algorithm, "kid": kid, "typ": "JWT"},
+                    separators=(",", ":"),
+                    sort_keys=True,
+                ).encode()
+            )
+            self._header_segments[kid] = segment
+            self._kids_by_header[segment] = kid
+        return segment
+
+    def _sign(self, private_key, signing_input: bytes) -> bytes:
+        if self.algorithm == "EdDSA":
+            return private_key.sign(signing_input)
+        return private_key.sign(signing_input, padding.PKCS1v15(), hashes.SHA256())
+
+    def _verify(self, public_key, signature: bytes, signing_input: bytes) -> None:
+        if self.algorithm == "EdDSA":
+            public_key.verify(signature, signing_input)
+        else:
+            public_key.verify(
+                signature, signing_input, padding.PKCS1v15(), hashes.SHA256()
+            )
+
+    def encode(self, claims: dict) -> str:
+        kid, private_key = self.key_ring.signing_key()
+        signing_input = (
+            self._header_segment(kid) + b"." + _b64encode(_encode_json(claims))
+        )
+        signature = self._sign(private_key, signing_input)
+        return (signing_input + b"." + _b64encode(signature)).decode()
+
+    def decode(self, token: str) -> dict:
+        signing_input, header_segment, payload_segment, signature = _split_token(token)
+        kid = self._kids_by_header.get(header_segment)
+        if kid is None:
+            header = _load_segment(header_segment)
+            if header.get("alg") != self.algorithm:
+                raise JWTError("The specified alg value is not allowed")
+            kid = header.get("kid")
+        public_key = self.key_ring.public_key(kid) if isinstance(kid, str) else None
+        if public_key is None:
+            raise JWTError("Unknown signing key")
+        try:
+            self._verify(public_key, signature, signing_input)
+        except InvalidSignature:
+            raise JWTError("Signature verification failed.")
+        return _load_claims(payload_segment)
+
+
+def build_token_codec():
+    if settings.ALGORITHM in ASYMMETRIC_ALGORITHMS:
+        return AsymmetricTokenCodec(get_key_ring())
+    if settings.ALGORITHM == HS256TokenCodec.algorithm:
+        return HS256TokenCodec(settings.SECRET_KEY)
+    return JoseTokenCodec(settings.SECRET_KEY, settings.ALGORITHM)
+
+
+token_codec = build_token_codec()
+
+
+def _expires_at(delta: timedelta) -> int:
+    """Absolute exp claim, truncated to whole seconds like python-jose"""
+    return int(time.time() + delta.total_seconds())
+
+
+def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
+    expire = _expires_at(
+        expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
-    return encoded_jwt
+    return token_codec.encode({**data, "exp": expire})
 
 
 def create_refresh_token(data: dict) -> str:
     """Create a refresh token with 7 days expiry"""
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=7)
-    to_encode.update({"exp": expire, "type": "refresh"})
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    expire = _expires_at(timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
+    # jti keeps every issued refresh token distinct, so rotation can spot reuse
+    return token_codec.encode(
+        {**data, "exp": expire, "type": "refresh", "jti": uuid.uuid4().hex}
+    )
+
+
+def verify_refresh_token(token: str) -> dict | None:
+    """Verify refresh token and return payload if valid"""
+    try:
+        payload = decode_token(token)
+        if payload.get("type") != "refresh":
+            return None
+        return payload
+    except JWTError:
+        return None
 
 
 def create_otp_verification_token(user_id: str, email: str) -> str:
     """Create a token for OTP verification (10 minutes expiry)"""
-    expire = datetime.utcnow() + timedelta(minutes=10)
-    to_encode = {"sub": user_id, "email": email, "exp": expire, "type": "otp_verify"}
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    expire = _expires_at(timedelta(minutes=10))
+    return token_codec.encode(
+        {"sub": user_id, "email": email, "exp": expire, "type": "otp_verify"}
+    )
 
 
 def verify_otp_verification_token(token: str) -> dict | None:
     """Verify OTP verification token and return payload if valid"""
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        payload = decode_token(token)
         if payload.get("type") != "otp_verify":
             return None
         return payload
@@ -61,17 +356,16 @@ def verify_otp_verification_token(token: str) -> dict | None:
 
 def create_reset_token(user_id: str, email: str) -> str:
     """Create a short-lived reset token (5 minutes)"""
-    expire = datetime.utcnow() + timedelta(minutes=5)
-    to_encode = {"sub": user_id, "email": email, "exp": expire, "type": "reset"}
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    expire = _expires_at(timedelta(minutes=5))
+    return token_codec.encode(
+        {"sub": user_id, "email": email, "exp": expire, "type": "reset"}
+    )
 
 
 def verify_reset_token(token: str) -> dict | None:
     """Verify reset token and return payload if valid"""
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        payload = decode_token(token)
         if payload.get("type") != "reset":
             return None
         return payload
@@ -79,11 +373,50 @@ def verify_reset_token(token: str) -> dict | None:
         return None
 
 
+def verify_access_token(token: str) -> dict | None:
+    """Verify an access token; refresh, OTP and reset tokens all carry a type"""
+    try:
+        payload = decode_token(token)
+        if "type" in payload:
+            return None
+        return payload
+    except JWTError:
+        return None
+
+
 def verify_token(token: str) -> dict | None:
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        payload = decode_token(token)
         return payload
     except JWTError:
         return None
+
+
+# Decoded claims keyed by token digest, each entry dropped at the token's exp
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE)
+
+if get_key_ring() is not None:
+    # A key removed from the ring must stop verifying straight away
+    get_key_ring().on_reload(token_cache.clear)
+
+
+def decode_token(token: str) -> dict:
+    """Decode and verify a JWT, reusing the claims of a token seen before"""
+    if get_key_ring() is not None:
+        # Rescan for rotated keys first so a retired key's cached tokens go too;
+        # a no-op while the app re-scans in the background
+        get_key_ring().refresh()
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = token_codec.decode(token)
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            token_cache.set(key, payload, exp, tag=payload.get("sub"))
+    # Callers get their own copy so the cached claims can't be mutated
+    return dict(payload)
+
+
+def invalidate_cached_tokens(user_id: str) -> None:
+    """Forget every cached token payload issued to a user"""
+    token_cache.invalidate_tag(user_id)
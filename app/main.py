@@ -1,34 +1,121 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
+import asyncio
 import logging
-from sqlalchemy import text
-from app.core.database import Base, engine
-from app.core.redis import ping_redis
-from app.routers import auth
+from app.core.database import async_engine, close_async_engine, replica_engines
+from app.core.db_pool import pool_stats
+from app.core.schema import current_schema_revision, expected_schema_revision
+from app.core.redis import close_async_redis, get_async_redis, ping_redis_async
+from app.core.keys import (
+    get_key_ring,
+    load_signing_keys,
+    refresh_keys_periodically,
+)
+from app.core.hash_pool import HashPoolBusyError, get_hash_pool
+from app.core.metrics import MetricsMiddleware, mark_worker_dead, render_metrics
+from app.core.pool_usage import record_pool_usage, record_pool_usage_periodically
+from app.core.profiling import ProfilingMiddleware, listen_for_profiling_changes
+from app.core.config import settings
+from app.core.security import (
+    configure_hash_policy,
+    resolve_hash_rounds,
+    token_cache,
+)
+from app.utils.cache import listen_for_invalidations
+from app.utils.token_storage import TOKEN_INVALIDATION_CHANNEL, token_near_cache
+from app.utils.user_cache import USER_INVALIDATION_CHANNEL, user_local_cache
+from app.utils.email_outbox import outbox_stats
+from app.utils.smtp_pool import close_smtp_pool, get_smtp_pool
+from app.routers import auth, debug, jwks
 
 logger = logging.getLogger("uvicorn.error")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Check database connection
+    # Check database connection and schema revision in one query; the
+    # schema itself is managed by migrations (make migrate)
     db_connected = False
+    schema_revision = None
     try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
+        async with async_engine.connect() as conn:
+            schema_revision = await current_schema_revision(conn)
         db_connected = True
         logger.info("Database connection successful.")
     except Exception as exc:
         logger.exception("Database connection failed during startup: %s", exc)
 
-    app.state.db_connected = db_connected
+    expected_revision = expected_schema_revision()
+    if db_connected and schema_revision != expected_revision:
+        logger.error(
+            f"Database schema is at revision {schema_revision}, expected "
+            f"{expected_revision}. Run `make migrate`."
+        )
 
-    # Check Redis connection
-    redis_connected = ping_redis()
+    app.state.db_connected = db_connected
+    app.state.schema_revision = schema_revision
+    app.state.schema_up_to_date = schema_revision == expected_revision
+
+    # Refuse to start without a key to sign with, rather than fail every
+    # login; then re-scan for rotations off the event loop
+    key_refresher = None
+    if get_key_ring() is not None:
+        await load_signing_keys(get_key_ring())
+        key_refresher = asyncio.create_task(refresh_keys_periodically(get_key_ring()))
+
+    # Open this worker's async Redis pool and check the connection
+    get_async_redis()
+    redis_connected = await ping_redis_async()
     app.state.redis_connected = redis_connected
 
+    # Apply the hash cost policy here and in every hashing worker
+    hash_rounds = resolve_hash_rounds()
+    configure_hash_policy(hash_rounds)
+    get_hash_pool().configure_workers(configure_hash_policy, (hash_rounds,))
+
+    # Start the password hashing workers before the first request arrives
+    get_hash_pool().start()
+
+    # This worker's SMTP connection pool; connections open on first send
+    get_smtp_pool()
+
+    # Keep this worker's token and user caches coherent with every other process
+    invalidation_listener = asyncio.create_task(
+        listen_for_invalidations(TOKEN_INVALIDATION_CHANNEL, token_near_cache)
+    )
+    user_invalidation_listener = asyncio.create_task(
+        listen_for_invalidations(USER_INVALIDATION_CHANNEL, user_local_cache)
+    )
+
+    pool_usage_recorder = (
+        asyncio.create_task(record_pool_usage_periodically())
+        if settings.METRICS_ENABLED
+        else None
+    )
+
+    # Profiling toggles set through /debug/profiling reach every worker
+    profiling_listener = (
+        asyncio.create_task(listen_for_profiling_changes())
+        if settings.PROFILING_ENABLED
+        else None
+    )
+
     yield
 
+    if key_refresher is not None:
+        key_refresher.cancel()
+    invalidation_listener.cancel()
+    user_invalidation_listener.cancel()
+    if pool_usage_recorder is not None:
+        pool_usage_recorder.cancel()
+    if profiling_listener is not None:
+        profiling_listener.cancel()
+    get_hash_pool().shutdown()
+    await close_smtp_pool()
+    await close_async_redis()
+    await close_async_engine()
+    mark_worker_dead()
     logger.info("Shutting down Cartify API.")
 
 
@@ -41,15 +128,31 @@ try:
 except ImportError:
     logger.debug("One or more schema modules failed to import during startup.")
 
-
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(
     title="Cartify API",
     lifespan=lifespan,
 )
 
 app.include_router(auth.router)
+app.include_router(jwks.router)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Off by default; when disabled there is no middleware to pass through at all
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+    app.include_router(debug.router)
+
+
+@app.exception_handler(HashPoolBusyError)
+async def hash_pool_busy_handler(request: Request, exc: HashPoolBusyError):
+    logger.warning(f"Password hash pool unavailable: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service temporarily unavailable, please retry"},
+        headers={"Retry-After": "1"},
+    )
 
 
 @app.get("/")
@@ -60,9 +163,33 @@ def welcome():
 
 
 @app.get("/health")
-def health():
+async def health():
+    try:
+        email_outbox = await outbox_stats()
+    except Exception as e:
+        logger.error(f"Email outbox stats unavailable: {e}")
+        email_outbox = None
     return {
         "status": "ok",
         "db_connected": getattr(app.state, "db_connected", False),
+        "schema_revision": getattr(app.state, "schema_revision", None),
+        "schema_up_to_date": getattr(app.state, "schema_up_to_date", False),
         "redis_connected": getattr(app.state, "redis_connected", False),
+        "db_pool": pool_stats(async_engine),
+        "db_replica_pools": [pool_stats(engine) for engine in replica_engines],
+        "hash_pool": get_hash_pool().stats(),
+        "token_cache": token_cache.stats(),
+        "token_near_cache": token_near_cache.stats() if token_near_cache else None,
+        "user_cache": user_local_cache.stats() if user_local_cache else None,
+        "email_outbox": email_outbox,
+        "smtp_pool": get_smtp_pool().stats(),
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    record_pool_usage()
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,169 @@
+import uuid
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas.user import User
+
+# Core statements over the users table, built once at import. Executing them
+# on the session's connection skips ORM hydration and the identity map, and
+# a constant statement object always hits SQLAlchemy's compiled cache.
+users = User.__table__
+
+USER_RECORD_COLUMNS = (users.c.id, users.c.email, users.c.role, users.c.password)
+
+USER_PROFILE_COLUMNS = (users.c.id, users.c.email, users.c.role, users.c.is_verified)
+
+SELECT_USER_BY_EMAIL = select(*USER_RECORD_COLUMNS).where(
+    users.c.email == bindparam("email")
+)
+
+SELECT_USER_BY_ID = select(*USER_RECORD_COLUMNS).where(
+    users.c.id == bindparam("user_id")
+)
+
+SELECT_USER_PROFILE_BY_EMAIL = select(*USER_PROFILE_COLUMNS).where(
+    users.c.email == bindparam("email")
+)
+
+SELECT_USER_PROFILE_BY_ID = select(*USER_PROFILE_COLUMNS).where(
+    users.c.id == bindparam("user_id")
+)
+
+UPDATE_USER_PASSWORD = (
+    update(users)
+    .where(users.c.id == bindparam("user_id"))
+    .values(password=bindparam("new_password"))
+)
+
+# Only replaces the hash that was read, never a concurrent change
+REPLACE_USER_PASSWORD = (
+    update(users)
+    .where(
+        users.c.id == bindparam("user_id"),
+        users.c.password == bindparam("old_password"),
+    )
+    .values(password=bindparam("new_password"))
+)
+
+
+class UserRecord:
+    """
+    Read-only view of the user columns the auth flows need. `id` is kept as
+    a string, the form used in tokens and Redis keys.
+    """
+
+    __slots__ = ("id", "email", "role", "password")
+
+    def __init__(self, id: str, email: str, role: str, password: str):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.password = password
+
+    def __repr__(self) -> str:
+        return f"<UserRecord id={self.id} email={self.email!r} role={self.role!r}>"
+
+
+class UserProfile:
+    """
+    Cacheable view of a user: everything the account flows need except the
+    password hash, which never leaves the database for a cache.
+    """
+
+    __slots__ = ("id", "email", "role", "is_verified")
+
+    def __init__(self, id: str, email: str, role: str, is_verified: bool):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.is_verified = is_verified
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "email": self.email,
+            "role": self.role,
+            "is_verified": self.is_verified,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UserProfile":
+        return cls(data["id"], data["email"], data["role"], data["is_verified"])
+
+    def __repr__(self) -> str:
+        return f"<UserProfile id={self.id} email={self.email!r} role={self.role!r}>"
+
+
+async def _fetch_user(db: AsyncSession, statement, params: dict) -> UserRecord | None:
+    connection = await db.connection()
+    row = (await connection.execute(statement, params)).first()
+    if row is None:
+        return None
+    user_id, email, role, password = row
+    return UserRecord(str(user_id), email, role, password)
+
+
+def parse_user_id(user_id: str) -> uuid.UUID | None:
+    """User id from a token or Redis key, None if it cannot be one"""
+    try:
+        return uuid.UUID(user_id)
+    except (TypeError, ValueError):
+        return None
+
+
+async def get_user_by_email(db: AsyncSession, email: str) -> UserRecord | None:
+    return await _fetch_user(db, SELECT_USER_BY_EMAIL, {"email": email})
+
+
+async def get_user_by_id(db: AsyncSession, user_id: str) -> UserRecord | None:
+    parsed_id = parse_user_id(user_id)
+    if parsed_id is None:
+        return None
+    return await _fetch_user(db, SELECT_USER_BY_ID, {"user_id": parsed_id})
+
+
+async def _fetch_profile(
+    db: AsyncSession, statement, params: dict
+) -> UserProfile | None:
+    connection = await db.connection()
+    row = (await connection.execute(statement, params)).first()
+    if row is None:
+        return None
+    user_id, email, role, is_verified = row
+    return UserProfile(str(user_id), email, role, is_verified)
+
+
+async def get_user_profile_by_email(db: AsyncSession, email: str) -> UserProfile | None:
+    return await _fetch_profile(db, SELECT_USER_PROFILE_BY_EMAIL, {"email": email})
+
+
+async def get_user_profile_by_id(db: AsyncSession, user_id: str) -> UserProfile | None:
+    parsed_id = parse_user_id(user_id)
+    if parsed_id is None:
+        return None
+    return await _fetch_profile(db, SELECT_USER_PROFILE_BY_ID, {"user_id": parsed_id})
+
+
+async def update_user_password(db: AsyncSession, user_id: str, new_hash: str) -> None:
+    connection = await db.connection()
+    await connection.execute(
+        UPDATE_USER_PASSWORD,
+        {"user_id": uuid.UUID(user_id), "new_password": new_hash},
+    )
+
+
+async def replace_user_password(
+    db: AsyncSession, user_id: str, old_hash: str, new_hash: str
+) -> bool:
+    """Swap `old_hash` for `new_hash`; False if the stored hash has changed"""
+    connection = await db.connection()
+    result = await connection.execute(
+        REPLACE_USER_PASSWORD,
+        {
+            "user_id": uuid.UUID(user_id),
+            "old_password": old_hash,
+            "new_password": new_hash,
+        },
+    )
+    return result.rowcount > 0
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, Header
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, BackgroundTasks, Depends, Header
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db, get_read_db
+from app.core.rate_limit import rate_limit
 from app.schemas.auth import (
     RegisterRequest,
     RegisterResponse,
     LoginRequest,
     LoginResponse,
+    RefreshTokenRequest,
+    RefreshTokenResponse,
     LogoutResponse,
     ForgotPasswordRequest,
     ForgotPasswordResponse,
@@ -19,20 +22,40 @@ from app.services import auth_service
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
-@router.post("/register", response_model=RegisterResponse, status_code=201)
-async def register(data: RegisterRequest, db: Session = Depends(get_db)):
+@router.post(
+    "/register",
+    response_model=RegisterResponse,
+    status_code=201,
+    dependencies=[Depends(rate_limit("register"))],
+)
+async def register(data: RegisterRequest, db: AsyncSession = Depends(get_db)):
     """Register a new user with customer profile"""
     return await auth_service.register_user(db, data)
 
 
-@router.post("/login", response_model=LoginResponse)
-def login(data: LoginRequest, db: Session = Depends(get_db)):
+@router.post(
+    "/login",
+    response_model=LoginResponse,
+    dependencies=[Depends(rate_limit("login"))],
+)
+async def login(
+    data: LoginRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db),
+):
     """Login with email and password"""
-    return auth_service.login_user(db, data)
+    return await auth_service.login_user(db, read_db, data, background_tasks)
+
+
+@router.post("/refresh", response_model=RefreshTokenResponse)
+async def refresh(data: RefreshTokenRequest):
+    """Exchange a refresh token for new access and refresh tokens"""
+    return await auth_service.refresh_tokens(data)
 
 
 @router.post("/logout", response_model=LogoutResponse)
-def logout(authorization: str = Header(...)):
+async def logout(authorization: str = Header(...)):
     """Logout user by invalidating tokens"""
     if not authorization.startswith("Bearer "):
         from fastapi import HTTPException, status
@@ -43,22 +66,36 @@ def logout(authorization: str = Header(...)):
         )
 
     access_token = authorization.replace("Bearer ", "")
-    return auth_service.logout_user(access_token)
+    return await auth_service.logout_user(access_token)
 
 
-@router.post("/forgot-password", response_model=ForgotPasswordResponse)
-async def forgot_password(data: ForgotPasswordRequest, db: Session = Depends(get_db)):
+@router.post(
+    "/forgot-password",
+    response_model=ForgotPasswordResponse,
+    dependencies=[Depends(rate_limit("forgot-password"))],
+)
+async def forgot_password(
+    data: ForgotPasswordRequest,
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db),
+):
     """Step 1: Request password reset OTP and receive verification token"""
-    return await auth_service.forgot_password(db, data)
+    return await auth_service.forgot_password(db, read_db, data)
 
 
 @router.post("/verify-otp", response_model=VerifyOTPResponse)
-def verify_otp(data: VerifyOTPRequest, db: Session = Depends(get_db)):
+async def verify_otp(
+    data: VerifyOTPRequest,
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db),
+):
     """Step 2: Verify OTP using verification token and get password reset token"""
-    return auth_service.verify_otp(db, data)
+    return await auth_service.verify_otp(db, read_db, data)
 
 
 @router.post("/reset-password", response_model=ResetPasswordResponse)
-async def reset_password(data: ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password(
+    data: ResetPasswordRequest, db: AsyncSession = Depends(get_db)
+):
     """Step 3: Reset password using reset token"""
     return await auth_service.reset_password(db, data)
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import tracemalloc
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+
+from app.core.profiling import (
+    PROFILE_FORMATS,
+    list_profiles,
+    memory_report,
+    profiles_dir,
+    profiling_state,
+    publish_profiling_settings,
+    start_memory_tracing,
+    stop_memory_tracing,
+)
+from app.core.security import verify_access_token
+
+
+def require_admin(authorization: str = Header(...)) -> dict:
+    """Only an admin's access token may use the debug endpoints"""
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authorization header format",
+        )
+    payload = verify_access_token(authorization.removeprefix("Bearer "))
+    if not payload:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+        )
+    if payload.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return payload
+
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["Debug"],
+    dependencies=[Depends(require_admin)],
+    include_in_schema=False,
+)
+
+
+class ProfilingToggle(BaseModel):
+    sample_every: int = Field(ge=0, description="Profile 1 in N requests, 0 stops")
+    format: str = Field(default="collapsed", pattern="^(collapsed|speedscope)$")
+
+
+@router.get("/profiling")
+async def profiling_status():
+    """This worker's profiling toggle, and the saved profiles"""
+    saved = await asyncio.to_thread(list_profiles)
+    return {**profiling_state.stats(), "saved": saved}
+
+
+@router.put("/profiling")
+async def set_profiling(toggle: ProfilingToggle):
+    """Profile 1 in N requests, in every worker"""
+    await publish_profiling_settings(toggle.sample_every, toggle.format)
+    return profiling_state.stats()
+
+
+@router.get("/profiles/{filename}")
+async def get_profile(filename: str):
+    """A saved profile, as named in the X-Profile-Id response header"""
+    path = profiles_dir() / filename
+    if (
+        os.path.basename(filename) != filename
+        or not filename.endswith(tuple(PROFILE_FORMATS.values()))
+        or not path.is_file()
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    media_type = "application/json" if filename.endswith(".json") else "text/plain"
+    return FileResponse(path, media_type=media_type)
+
+
+@router.post("/tracemalloc/start")
+async def tracemalloc_start(frames: int = Query(default=1, ge=1, le=50)):
+    """Start tracing allocations in the worker that handles this request"""
+    start_memory_tracing(frames)
+    return {"pid": os.getpid(), "tracing": True}
+
+
+@router.get("/tracemalloc")
+async def tracemalloc_snapshot(
+    limit: int = Query(default=25, ge=1, le=500),
+    group_by: str = Query(default="lineno", pattern="^(lineno|filename|traceback)$"),
+):
+    """Top allocation sites, and growth since this worker's previous snapshot"""
+    if not tracemalloc.is_tracing():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="tracemalloc is not running in this worker",
+        )
+    return await asyncio.to_thread(memory_report, limit, group_by)
+
+
+@router.post("/tracemalloc/stop")
+async def tracemalloc_stop():
+    stop_memory_tracing()
+    return {"pid": os.getpid(), "tracing": False}
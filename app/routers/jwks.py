@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Request, Response
+from app.core.config import settings
+from app.core.keys import get_key_ring
+
+router = APIRouter(tags=["Keys"])
+
+EMPTY_JWKS = b'{"keys":[]}'
+
+
+@router.get("/.well-known/jwks.json")
+def jwks(request: Request):
+    """Public token-signing keys, for verifying Cartify tokens locally"""
+    key_ring = get_key_ring()
+    document, etag = key_ring.jwks() if key_ring else (EMPTY_JWKS, '"empty"')
+    headers = {
+        "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}",
+        "ETag": etag,
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=document, media_type="application/json", headers=headers)
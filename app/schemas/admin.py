@@ -1,14 +1,15 @@
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, String, ForeignKey, Uuid
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.utils.ids import uuid7
 
 
 class Admin(Base):
     __tablename__ = "admins"
 
-    id = Column(String, primary_key=True, index=True)
+    id = Column(Uuid, primary_key=True, index=True, default=uuid7)
     user_id = Column(
-        String,
+        Uuid,
         ForeignKey("users.id", ondelete="CASCADE"),
         unique=True,
         nullable=False,
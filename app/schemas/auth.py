@@ -27,6 +27,15 @@ class LoginResponse(BaseModel):
     refresh_token: str
 
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
+class RefreshTokenResponse(BaseModel):
+    access_token: str
+    refresh_token: str
+
+
 class LogoutResponse(BaseModel):
     message: str
 
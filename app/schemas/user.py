@@ -1,13 +1,14 @@
 from pydantic import BaseModel
-from sqlalchemy import Column, String, Boolean, DateTime, func
+from sqlalchemy import Column, String, Boolean, DateTime, Uuid, func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.utils.ids import uuid7
 
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(String, primary_key=True, index=True)
+    id = Column(Uuid, primary_key=True, index=True, default=uuid7)
     email = Column(String(255), unique=True, nullable=False, index=True)
     phone = Column(String(50), unique=True, nullable=True)
     role = Column(String(50), nullable=False, default="customer")
@@ -1,12 +1,27 @@
-from sqlalchemy.orm import Session
-from fastapi import HTTPException, status
+from sqlalchemy import Uuid, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import BackgroundTasks, HTTPException, status
+from app.core.database import (
+    AsyncSessionLocal,
+    choose_read_session,
+    mark_recent_write,
+)
 from app.schemas.user import User
 from app.schemas.customer import Customer
+from app.queries.user import (
+    get_user_by_email,
+    get_user_by_id,
+    replace_user_password,
+    update_user_password,
+)
 from app.schemas.auth import (
     RegisterRequest,
     RegisterResponse,
     LoginRequest,
     LoginResponse,
+    RefreshTokenRequest,
+    RefreshTokenResponse,
     LogoutResponse,
     ForgotPasswordRequest,
     ForgotPasswordResponse,
@@ -19,8 +34,11 @@ from app.core.security import (
     create_otp_verification_token,
     verify_otp_verification_token,
     create_refresh_token,
-    hash_password,
-    verify_password,
+    verify_refresh_token,
+    hash_password_async,
+    verify_password_async,
+    is_password_hash,
+    password_needs_rehash,
     create_access_token,
     create_reset_token,
     verify_reset_token,
@@ -28,111 +46,175 @@ from app.core.security import (
 )
 from app.utils.otp import (
     generate_otp,
-    store_otp_redis,
-    get_otp_redis,
-    delete_otp_redis,
+    store_otp_redis_async,
+    consume_otp_redis_async,
+    OTPVerification,
 )
-from app.utils.token_storage import (
-    store_tokens_redis,
-    get_tokens_redis,
-    delete_tokens_redis,
-)
-from app.utils.email import send_email
+from app.utils.token_storage import TokenRotation, get_token_store
+from app.utils.user_cache import get_user_cache
+from app.utils.email_outbox import enqueue_email
+from app.utils.ids import uuid7
 from app.templates.auth import (
     get_otp_email_template,
     get_welcome_email_template,
     get_password_reset_success_email_template,
 )
-from app.core.redis import get_redis
+from app.core.redis import get_async_redis
+from app.core.metrics import stage_timer
 import logging
 import uuid
 
 logger = logging.getLogger("uvicorn.error")
 
 
-async def register_user(db: Session, data: RegisterRequest) -> RegisterResponse:
-    existing_user = db.query(User).filter(User.email == data.email).first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered",
+def build_register_statement(
+    user_id: uuid.UUID,
+    customer_id: uuid.UUID,
+    data: RegisterRequest,
+    hashed_password: str,
+):
+    """
+    Insert the user and their customer profile in one statement. The unique
+    constraints on users.email and users.phone do the duplicate checks, so
+    concurrent signups cannot both pass a SELECT and then collide.
+    """
+    new_user = (
+        insert(User)
+        .values(
+            id=user_id,
+            email=data.email,
+            phone=data.phone,
+            password=hashed_password,
+            role="customer",
+            is_verified=False,
+        )
+        .returning(User.id)
+        .cte("new_user")
+    )
+    new_customer = (
+        insert(Customer)
+        .from_select(
+            ["id", "user_id", "first_name", "last_name"],
+            select(
+                literal(customer_id, Uuid),
+                new_user.c.id,
+                literal(data.first_name),
+                literal(data.last_name),
+            ),
         )
+        .returning(Customer.user_id)
+        .cte("new_customer")
+    )
+    return select(new_customer.c.user_id)
+
 
-    if data.phone:
-        existing_phone = db.query(User).filter(User.phone == data.phone).first()
-        if existing_phone:
+def unique_violation_column(exc: IntegrityError) -> str | None:
+    """Which of users.email / users.phone a unique violation was raised for"""
+    orig = exc.orig
+    constraint = (
+        getattr(orig, "constraint_name", None)  # asyncpg
+        or getattr(getattr(orig, "__cause__", None), "constraint_name", None)
+        or getattr(getattr(orig, "diag", None), "constraint_name", None)  # psycopg2
+        or str(orig)
+    )
+    for column in ("email", "phone"):
+        if column in constraint:
+            return column
+    return None
+
+
+async def register_user(db: AsyncSession, data: RegisterRequest) -> RegisterResponse:
+    user_id = uuid7()
+    customer_id = uuid7()
+    with stage_timer("register", "hash_password"):
+        hashed_pwd = await hash_password_async(data.password)
+
+    try:
+        with stage_timer("register", "db.insert_user"):
+            await db.execute(
+                build_register_statement(user_id, customer_id, data, hashed_pwd)
+            )
+        with stage_timer("register", "db.commit"):
+            await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        column = unique_violation_column(e)
+        if column == "email":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered",
+            )
+        if column == "phone":
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Phone number already registered",
             )
+        raise
 
-    user_id = str(uuid.uuid4())
-    hashed_pwd = hash_password(data.password)
-    new_user = User(
-        id=user_id,
-        email=data.email,
-        phone=data.phone,
-        password=hashed_pwd,
-        role="customer",
-        is_verified=False,
-    )
-    db.add(new_user)
-    db.flush()
+    with stage_timer("register", "redis.mark_recent_write"):
+        await mark_recent_write(data.email)
 
-    customer_id = str(uuid.uuid4())
-    new_customer = Customer(
-        id=customer_id,
-        user_id=user_id,
-        first_name=data.first_name,
-        last_name=data.last_name,
-    )
-    db.add(new_customer)
-    db.commit()
-    db.refresh(new_user)
-
-    logger.info(f"User registered: {new_user.email}")
+    logger.info(f"User registered: {data.email}")
 
     user_name = f"{data.first_name} {data.last_name}"
-    welcome_body = get_welcome_email_template(user_name, new_user.email)
-    await send_email(
-        subject="Welcome to Cartify! 🛒",
-        recipients=[new_user.email],
-        body=welcome_body,
-    )
+    welcome_email = get_welcome_email_template(user_name, data.email)
+    with stage_timer("register", "redis.enqueue_email"):
+        await enqueue_email(
+            subject="Welcome to Cartify! 🛒",
+            recipients=[data.email],
+            body=welcome_email.html,
+            text_body=welcome_email.text,
+        )
 
     return RegisterResponse(
         message="User registered successfully",
-        user_id=new_user.id,
-        email=new_user.email,
+        user_id=str(user_id),
+        email=data.email,
         first_name=data.first_name,
         last_name=data.last_name,
     )
 
 
-def login_user(db: Session, data: LoginRequest) -> LoginResponse:
-    user = db.query(User).filter(User.email == data.email).first()
+async def login_user(
+    db: AsyncSession,
+    read_db: AsyncSession,
+    data: LoginRequest,
+    background_tasks: BackgroundTasks,
+) -> LoginResponse:
+    with stage_timer("login", "redis.choose_read_session"):
+        read_session = await choose_read_session(data.email, db, read_db)
+    with stage_timer("login", "db.get_user_by_email"):
+        user = await get_user_by_email(read_session, data.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
         )
 
-    if not user.password or not user.password.startswith(("$2a$", "$2b$", "$2y$")):
+    if not is_password_hash(user.password):
         logger.error(f"User {user.email} has invalid password hash")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
         )
 
-    if not verify_password(data.password, user.password):
+    with stage_timer("login", "verify_password"):
+        password_ok = await verify_password_async(data.password, user.password)
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
         )
 
-    redis_client = get_redis()
+    if password_needs_rehash(user.password):
+        background_tasks.add_task(
+            rehash_user_password, user.id, user.password, data.password
+        )
+
+    token_store = get_token_store()
 
-    existing_tokens = get_tokens_redis(redis_client, user.id)
+    with stage_timer("login", "redis.fetch_tokens"):
+        existing_tokens = await token_store.fetch(user.id)
 
     if (
         existing_tokens
@@ -145,21 +227,89 @@ def login_user(db: Session, data: LoginRequest) -> LoginResponse:
             refresh_token=existing_tokens["refresh_token"],
         )
 
-    access_token = create_access_token(
-        data={"sub": user.id, "email": user.email, "role": user.role}
-    )
-    refresh_token = create_refresh_token(
-        data={"sub": user.id, "email": user.email, "role": user.role}
-    )
+    with stage_timer("login", "sign_tokens"):
+        access_token = create_access_token(
+            data={"sub": user.id, "email": user.email, "role": user.role}
+        )
+        refresh_token = create_refresh_token(
+            data={"sub": user.id, "email": user.email, "role": user.role}
+        )
 
-    store_tokens_redis(redis_client, user.id, access_token, refresh_token)
+    with stage_timer("login", "redis.store_tokens"):
+        await token_store.store(user.id, access_token, refresh_token)
 
     logger.info(f"User logged in with new tokens: {user.email}")
 
     return LoginResponse(access_token=access_token, refresh_token=refresh_token)
 
 
-def logout_user(access_token: str) -> LogoutResponse:
+async def rehash_user_password(
+    user_id: str, old_hash: str, plain_password: str
+) -> None:
+    """Re-hash a password under the current cost policy after a successful login"""
+    with stage_timer("rehash", "hash_password"):
+        new_hash = await hash_password_async(plain_password)
+    async with AsyncSessionLocal() as db:
+        try:
+            # Only replace the hash we verified, never a concurrent password reset
+            with stage_timer("rehash", "db.replace_user_password"):
+                updated = await replace_user_password(db, user_id, old_hash, new_hash)
+                await db.commit()
+            if updated:
+                logger.info(
+                    f"Password rehashed under current policy: user_id={user_id}"
+                )
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Failed to rehash password for user_id={user_id}: {str(e)}")
+
+
+async def refresh_tokens(data: RefreshTokenRequest) -> RefreshTokenResponse:
+    """Exchange a refresh token for a new access/refresh pair, rotating both"""
+    payload = verify_refresh_token(data.refresh_token)
+    if not payload or not payload.get("sub"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+        )
+
+    user_id = payload["sub"]
+    claims = {
+        "sub": user_id,
+        "email": payload.get("email"),
+        "role": payload.get("role"),
+    }
+    access_token = create_access_token(data=claims)
+    refresh_token = create_refresh_token(data=claims)
+
+    token_store = get_token_store()
+    with stage_timer("refresh", "redis.rotate_tokens"):
+        rotation = await token_store.rotate(
+            user_id, data.refresh_token, access_token, refresh_token
+        )
+    if rotation is TokenRotation.REUSED:
+        # A validly signed but superseded refresh token means it was replayed,
+        # so revoke the whole session rather than trust either holder
+        with stage_timer("refresh", "redis.revoke_tokens"):
+            await token_store.revoke(user_id)
+        logger.warning(f"Refresh token reuse detected: user_id={user_id}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has been revoked",
+        )
+    if rotation is not TokenRotation.ROTATED:
+        # The session expired or was ended by logout or a password reset
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+        )
+
+    logger.info(f"Tokens refreshed: user_id={user_id}")
+
+    return RefreshTokenResponse(access_token=access_token, refresh_token=refresh_token)
+
+
+async def logout_user(access_token: str) -> LogoutResponse:
     """Logout user by invalidating tokens in Redis"""
     payload = verify_token(access_token)
     if not payload:
@@ -175,8 +325,8 @@ def logout_user(access_token: str) -> LogoutResponse:
             detail="Invalid token payload",
         )
 
-    redis_client = get_redis()
-    delete_tokens_redis(redis_client, user_id)
+    with stage_timer("logout", "redis.revoke_tokens"):
+        await get_token_store().revoke(user_id)
 
     logger.info(f"User logged out: user_id={user_id}")
 
@@ -184,9 +334,12 @@ def logout_user(access_token: str) -> LogoutResponse:
 
 
 async def forgot_password(
-    db: Session, data: ForgotPasswordRequest
+    db: AsyncSession, read_db: AsyncSession, data: ForgotPasswordRequest
 ) -> ForgotPasswordResponse:
-    user = db.query(User).filter(User.email == data.email).first()
+    with stage_timer("forgot_password", "redis.choose_read_session"):
+        read_session = await choose_read_session(data.email, db, read_db)
+    with stage_timer("forgot_password", "user_cache.get_by_email"):
+        user = await get_user_cache().get_by_email(read_session, data.email)
     if not user:
         return ForgotPasswordResponse(
             message="If the email exists, an OTP has been sent"
@@ -202,17 +355,20 @@ async def forgot_password(
             detail="Failed to generate OTP",
         )
 
-    redis_client = get_redis()
-    store_otp_redis(redis_client, user.email, user.id, otp_code)
+    redis_client = get_async_redis()
+    with stage_timer("forgot_password", "redis.store_otp"):
+        await store_otp_redis_async(redis_client, user.id, otp_code)
 
     logger.info(f"OTP generated for {user.email}: {otp_code}")
 
-    otp_body = get_otp_email_template(otp_code, user.email)
-    await send_email(
-        subject="Cartify - Password Reset OTP",
-        recipients=[user.email],
-        body=otp_body,
-    )
+    otp_email = get_otp_email_template(otp_code, user.email)
+    with stage_timer("forgot_password", "redis.enqueue_email"):
+        await enqueue_email(
+            subject="Cartify - Password Reset OTP",
+            recipients=[user.email],
+            body=otp_email.html,
+            text_body=otp_email.text,
+        )
 
     return ForgotPasswordResponse(
         message="If the email exists, an OTP has been sent",
@@ -220,7 +376,9 @@ async def forgot_password(
     )
 
 
-def verify_otp(db: Session, data: VerifyOTPRequest) -> VerifyOTPResponse:
+async def verify_otp(
+    db: AsyncSession, read_db: AsyncSession, data: VerifyOTPRequest
+) -> VerifyOTPResponse:
     """Step 2: Verify OTP using the verification token and return a reset token"""
     payload = verify_otp_verification_token(data.otp_verification_token)
     if not payload:
@@ -231,29 +389,38 @@ def verify_otp(db: Session, data: VerifyOTPRequest) -> VerifyOTPResponse:
 
     user_id = payload.get("sub")
 
-    user = db.query(User).filter(User.id == user_id).first()
+    with stage_timer("verify_otp", "redis.choose_read_session"):
+        read_session = await choose_read_session(payload.get("email", ""), db, read_db)
+    with stage_timer("verify_otp", "user_cache.get_by_id"):
+        user = await get_user_cache().get_by_id(read_session, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User not found",
         )
 
-    redis_client = get_redis()
-    otp_data = get_otp_redis(redis_client, user.email)
+    redis_client = get_async_redis()
+    with stage_timer("verify_otp", "redis.consume_otp"):
+        result = await consume_otp_redis_async(redis_client, user.id, data.otp)
 
-    if not otp_data:
+    if result is OTPVerification.EXPIRED:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired OTP",
         )
 
-    if otp_data["code"] != data.otp or otp_data["user_id"] != user.id:
+    if result is OTPVerification.LOCKED:
+        logger.warning(f"OTP locked after too many attempts for {user.email}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid OTP",
+            detail="Too many invalid attempts, please request a new OTP",
         )
 
-    delete_otp_redis(redis_client, user.email)
+    if result is not OTPVerification.VALID:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid OTP",
+        )
 
     reset_token = create_reset_token(user.id, user.email)
 
@@ -265,7 +432,7 @@ def verify_otp(db: Session, data: VerifyOTPRequest) -> VerifyOTPResponse:
 
 
 async def reset_password(
-    db: Session, data: ResetPasswordRequest
+    db: AsyncSession, data: ResetPasswordRequest
 ) -> ResetPasswordResponse:
     """Step 3: Reset password using reset token and send confirmation email"""
     payload = verify_reset_token(data.reset_token)
@@ -277,29 +444,42 @@ async def reset_password(
 
     user_id = payload.get("sub")
 
-    user = db.query(User).filter(User.id == user_id).first()
+    with stage_timer("reset_password", "db.get_user_by_id"):
+        user = await get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User not found",
         )
 
-    if verify_password(data.new_password, user.password):
+    with stage_timer("reset_password", "verify_password"):
+        same_password = await verify_password_async(data.new_password, user.password)
+    if same_password:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="New password cannot be the same as the old password",
         )
 
-    user.password = hash_password(data.new_password)
-    db.commit()
+    with stage_timer("reset_password", "hash_password"):
+        new_hash = await hash_password_async(data.new_password)
+    with stage_timer("reset_password", "db.update_user_password"):
+        await update_user_password(db, user.id, new_hash)
+    with stage_timer("reset_password", "db.commit"):
+        await db.commit()
+    with stage_timer("reset_password", "redis.invalidate_user_cache"):
+        await get_user_cache().invalidate(user.id, user.email)
+    with stage_timer("reset_password", "redis.mark_recent_write"):
+        await mark_recent_write(user.email)
 
     logger.info(f"Password reset successful for {user.email}")
 
-    reset_success_body = get_password_reset_success_email_template(user.email)
-    await send_email(
-        subject="Cartify - Password Reset Successful",
-        recipients=[user.email],
-        body=reset_success_body,
-    )
+    reset_success_email = get_password_reset_success_email_template(user.email)
+    with stage_timer("reset_password", "redis.enqueue_email"):
+        await enqueue_email(
+            subject="Cartify - Password Reset Successful",
+            recipients=[user.email],
+            body=reset_success_email.html,
+            text_body=reset_success_email.text,
+        )
 
     return ResetPasswordResponse(message="Password reset successfully")
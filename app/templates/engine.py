@@ -0,0 +1,160 @@
+import html
+import pathlib
+import re
+from html.parser import HTMLParser
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+TEMPLATE_DIR = pathlib.Path(__file__).resolve().parent / "email"
+
+environment = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=True,
+    undefined=StrictUndefined,
+)
+
+# Stands in for a dynamic field while a template is built; \x00 never occurs
+# in the templates and survives escaping, CSS inlining and minifying unchanged
+FIELD_MARKER = re.compile(r"\x00(\w+)\x00")
+
+STYLE_BLOCK = re.compile(r"<style[^>]*>(.*?)</style>", re.S | re.I)
+CSS_RULE = re.compile(r"([^{}]+)\{([^}]*)\}")
+START_TAG = re.compile(r"<([a-zA-Z][a-zA-Z0-9]*)([^<>]*?)(/?)>")
+CLASS_ATTR = re.compile(r'\sclass="([^"]*)"')
+STYLE_ATTR = re.compile(r'\sstyle="([^"]*)"')
+SIMPLE_SELECTOR = re.compile(r"^\.?[a-zA-Z][\w-]*$")
+
+
+def minify_css(css: str) -> str:
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([:;{},])\s*", r"\1", css)
+    return css.replace(";}", "}").strip().rstrip(";")
+
+
+def inline_css(document: str) -> str:
+    """
+    Copy the rules of the document's <style> blocks onto the elements they
+    match, as style attributes, since many mail clients drop <style>. Only
+    tag and single-class selectors are inlined; any other rule stays in a
+    minified <style> block.
+    """
+    rules: dict[str, str] = {}
+    leftover = []
+    for css in STYLE_BLOCK.findall(document):
+        for selectors, declarations in CSS_RULE.findall(css):
+            declarations = minify_css(declarations)
+            for selector in (s.strip() for s in selectors.split(",")):
+                if SIMPLE_SELECTOR.match(selector):
+                    rules[selector] = f"{rules.get(selector, '')};{declarations}"
+                else:
+                    leftover.append(f"{selector}{{{declarations}}}")
+
+    def apply(match: re.Match) -> str:
+        tag, attributes, self_closing = match.groups()
+        class_match = CLASS_ATTR.search(attributes)
+        selectors = [tag.lower()]
+        if class_match:
+            selectors += [f".{name}" for name in class_match.group(1).split()]
+        style = "".join(rules.get(selector, "") for selector in selectors)
+        if not style:
+            return match.group(0)
+        style_match = STYLE_ATTR.search(attributes)
+        if style_match:
+            # Existing inline styles win, so they go last
+            style += f";{style_match.group(1)}"
+            attributes = STYLE_ATTR.sub("", attributes)
+        return f'<{tag}{attributes} style="{style.strip(";")}"{self_closing}>'
+
+    replacement = f"<style>{''.join(leftover)}</style>" if leftover else ""
+    document = STYLE_BLOCK.sub("", document)
+    if replacement:
+        document = document.replace("</head>", f"{replacement}</head>", 1)
+    return START_TAG.sub(apply, document)
+
+
+def minify_html(document: str) -> str:
+    document = re.sub(r">\s+<", "><", document)
+    return re.sub(r"\s{2,}", " ", document).strip()
+
+
+class TextConverter(HTMLParser):
+    """Plain-text rendering of an HTML email: one paragraph per block element"""
+
+    BLOCK_TAGS = {"p", "div", "h1", "h2", "h3", "br", "tr", "li"}
+    SKIP_TAGS = {"head", "style", "script", "title"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skipping += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skipping -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.parts.append(re.sub(r"\s+", " ", data))
+
+    def text(self) -> str:
+        paragraphs = (line.strip() for line in "".join(self.parts).split("\n\n"))
+        return "\n\n".join(line for line in paragraphs if line) + "\n"
+
+
+def html_to_text(document: str) -> str:
+    converter = TextConverter()
+    converter.feed(document)
+    converter.close()
+    return converter.text()
+
+
+class RenderedEmail:
+    __slots__ = ("html", "text")
+
+    def __init__(self, html: str, text: str):
+        self.html = html
+        self.text = text
+
+
+class CompiledEmailTemplate:
+    """
+    An email template built once: rendered through Jinja with markers in
+    place of its fields, CSS inlined, minified, and converted to plain text,
+    then split at the markers into static chunks. render() only escapes the
+    field values and joins them with the chunks.
+    """
+
+    __slots__ = ("name", "fields", "html_chunks", "text_chunks")
+
+    def __init__(self, name: str, fields: tuple[str, ...]):
+        self.name = name
+        self.fields = fields
+        markers = {field: f"\x00{field}\x00" for field in fields}
+        document = environment.get_template(name).render(**markers)
+        document = minify_html(inline_css(document))
+        self.html_chunks = self._split(document)
+        self.text_chunks = self._split(html_to_text(document))
+
+    def _split(self, document: str) -> tuple[str, ...]:
+        # Alternates static chunks and field names: static, field, static, ...
+        parts = FIELD_MARKER.split(document)
+        unknown = set(parts[1::2]) - set(self.fields)
+        if unknown:
+            raise ValueError(f"Template {self.name} has unknown fields {unknown}")
+        return tuple(parts)
+
+    def render(self, **values: str) -> RenderedEmail:
+        escaped = {field: html.escape(values[field]) for field in self.fields}
+        html_parts = list(self.html_chunks)
+        html_parts[1::2] = map(escaped.__getitem__, self.html_chunks[1::2])
+        text_parts = list(self.text_chunks)
+        text_parts[1::2] = map(values.__getitem__, self.text_chunks[1::2])
+        return RenderedEmail("".join(html_parts), "".join(text_parts))
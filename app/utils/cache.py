@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from app.core.redis import listen
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire at an absolute epoch timestamp.
+
+    Entries may carry a tag (e.g. a user id) so that everything cached for
+    that tag can be dropped at once. Safe to share between the event loop
+    and threadpool workers.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, tuple[Any, float, Hashable]] = OrderedDict()
+        self._tags: dict[Hashable, set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by every invalidation, so a reader that started before one
+        # can tell its result may be stale and skip caching it
+        self.generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, key: Hashable) -> Any | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, _ = entry
+            if expires_at <= time.time():
+                self._pop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        expires_at: float,
+        tag: Hashable | None = None,
+    ) -> None:
+        if not self.enabled or expires_at <= time.time():
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, expires_at, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._pop(key)
+
+    def invalidate_tag(self, tag: Hashable) -> int:
+        """Drop every entry stored under `tag` and return how many were dropped"""
+        with self._lock:
+            self.generation += 1
+            keys = self._tags.pop(tag, set())
+            for key in keys:
+                self._data.pop(key, None)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _pop(self, key: Hashable) -> None:
+        entry = self._data.pop(key, None)
+        if entry is None or entry[2] is None:
+            return
+        keys = self._tags.get(entry[2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[entry[2]]
+
+
+async def listen_for_invalidations(channel: str, cache: TTLCache | None) -> None:
+    """
+    Drop the entries tagged with each value published on `channel`, for as
+    long as the app runs. Anything published while disconnected is unknown,
+    so the whole cache is cleared on every (re)subscribe.
+    """
+    if cache is None:
+        return
+    await listen(channel, cache.invalidate_tag, on_reset=cache.clear)
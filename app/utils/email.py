@@ -1,35 +1,45 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+from email.message import EmailMessage
+
 from app.core.config import settings
+from app.utils.smtp_pool import get_smtp_pool
 import logging
 
 logger = logging.getLogger("uvicorn.error")
 
-mail_config = ConnectionConfig(
-    MAIL_USERNAME=settings.MAIL_USERNAME,
-    MAIL_PASSWORD=settings.MAIL_PASSWORD,
-    MAIL_FROM=settings.MAIL_FROM,
-    MAIL_PORT=settings.MAIL_PORT,
-    MAIL_SERVER=settings.MAIL_HOST,
-    MAIL_STARTTLS=settings.MAIL_STARTTLS,
-    MAIL_SSL_TLS=settings.MAIL_SSL_TLS,
-    USE_CREDENTIALS=False,
-)
+
+def build_email_message(
+    subject: str, recipients: list[str], body: str, text_body: str | None = None
+) -> EmailMessage:
+    """HTML email, as multipart/alternative when a plain-text body is given"""
+    message = EmailMessage()
+    message["From"] = settings.MAIL_FROM
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+    if text_body:
+        message.set_content(text_body)
+        message.add_alternative(body, subtype="html")
+    else:
+        message.set_content(body, subtype="html")
+    return message
+
+
+async def deliver_email(
+    subject: str, recipients: list[str], body: str, text_body: str | None = None
+):
+    """Send an email over a pooled SMTP connection, raising if it was not accepted"""
+    await get_smtp_pool().send(
+        build_email_message(subject, recipients, body, text_body)
+    )
 
 
-async def send_email(subject: str, recipients: list[str], body: str):
+async def send_email(
+    subject: str, recipients: list[str], body: str, text_body: str | None = None
+):
     """
-    Sends an email using FastAPI-Mail configured for Mailhog.
+    Sends an email through the SMTP pool (Mailhog in development).
     """
     try:
-        message = MessageSchema(
-            subject=subject,
-            recipients=recipients,
-            body=body,
-            subtype="html",
-        )
-
-        fm = FastMail(mail_config)
-        await fm.send_message(message)
+        await deliver_email(subject, recipients, body, text_body)
         logger.info(f"Email sent successfully to {recipients}")
     except Exception as e:
         logger.error(f"Failed to send email to {recipients}: {str(e)}")
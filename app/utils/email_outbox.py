@@ -0,0 +1,288 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import time
+
+from redis.exceptions import ResponseError
+
+from app.core.config import settings
+from app.core.redis import get_async_redis
+from app.utils.email import deliver_email, send_email
+from app.utils.ids import uuid7
+
+logger = logging.getLogger("uvicorn.error")
+
+# All outbox keys share the {outbox} hash tag, so the retry script can touch
+# the retry set and the stream together on Redis Cluster
+OUTBOX_STREAM = "email:{outbox}:stream"
+OUTBOX_RETRY = "email:{outbox}:retry"  # ZSET of messages, scored by when to retry
+OUTBOX_DEAD = "email:{outbox}:dead"  # stream of messages that ran out of attempts
+OUTBOX_METRICS = "email:{outbox}:metrics"
+OUTBOX_GROUP = "email-workers"
+
+# Never dead-lettered: the bodies carry OTP and reset codes
+DEAD_LETTER_DROPPED_FIELDS = ("body", "text_body")
+
+
+def create_sent_counter_key(minute: int) -> str:
+    """Per-minute count of delivered messages, for throughput"""
+    return f"email:{{outbox}}:sent:{minute}"
+
+
+# Move up to ARGV[2] retries that are due (score <= ARGV[1]) back onto the
+# stream. Members are JSON [field, value, ...] lists, ready for XADD.
+RELEASE_RETRIES_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, payload in ipairs(due) do
+    redis.call('XADD', KEYS[2], '*', unpack(cjson.decode(payload)))
+    redis.call('ZREM', KEYS[1], payload)
+end
+return #due
+"""
+
+
+async def enqueue_email(
+    subject: str, recipients: list[str], body: str, text_body: str | None = None
+) -> None:
+    """
+    Queue an email for the delivery worker and return without waiting on
+    SMTP. Falls back to sending inline when the outbox is disabled or Redis
+    cannot take the message, so it is not lost either way.
+    """
+    if not settings.EMAIL_OUTBOX_ENABLED:
+        await send_email(
+            subject=subject, recipients=recipients, body=body, text_body=text_body
+        )
+        return
+    fields = {
+        "message_id": uuid7().hex,
+        "subject": subject,
+        "recipients": json.dumps(recipients),
+        "body": body,
+        "text_body": text_body or "",
+        "attempts": 0,
+        "enqueued_at": int(time.time() * 1000),
+        "last_error": "",
+    }
+    try:
+        await get_async_redis().xadd(
+            OUTBOX_STREAM,
+            fields,
+            maxlen=settings.EMAIL_OUTBOX_MAX_LENGTH,
+            approximate=True,
+        )
+    except Exception as e:
+        logger.error(f"Email outbox unavailable, sending inline: {e}")
+        await send_email(
+            subject=subject, recipients=recipients, body=body, text_body=text_body
+        )
+
+
+def retry_delay_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter: half fixed, half random"""
+    delay = min(
+        settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS,
+        settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1),
+    )
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class EmailOutboxWorker:
+    """
+    Drains the outbox stream through a consumer group, so several worker
+    processes can share the load and a crashed worker's messages are
+    reclaimed by the others.
+
+    Each batch is delivered concurrently. A failed message is scheduled on
+    the retry set with backoff, and dead-lettered once it has used
+    EMAIL_OUTBOX_MAX_ATTEMPTS. Either way it is acked and removed from the
+    stream, so the stream length is the undelivered backlog. Dead letters
+    keep only the envelope and the last error, without the bodies, and are
+    dropped after EMAIL_OUTBOX_DEAD_RETENTION_SECONDS.
+    """
+
+    def __init__(
+        self, redis_client, deliver=deliver_email, consumer: str | None = None
+    ):
+        self.redis = redis_client
+        self.deliver = deliver
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = settings.EMAIL_OUTBOX_BATCH_SIZE
+        self._release_retries = redis_client.register_script(RELEASE_RETRIES_SCRIPT)
+        self.sent = 0
+        self.failed = 0
+
+    async def setup(self) -> None:
+        try:
+            await self.redis.xgroup_create(
+                OUTBOX_STREAM, OUTBOX_GROUP, id="0", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def run(self, stop: asyncio.Event) -> None:
+        await self.setup()
+        logger.info(f"Email outbox worker {self.consumer} started")
+        while not stop.is_set():
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Email outbox worker error, retrying: {e}")
+                await asyncio.sleep(1)
+        logger.info(
+            f"Email outbox worker {self.consumer} stopped: "
+            f"sent={self.sent} failed={self.failed}"
+        )
+
+    async def run_once(self, block_ms: int = 1000) -> int:
+        """Process one batch; returns how many messages it handled"""
+        await self._release_retries(
+            keys=[OUTBOX_RETRY, OUTBOX_STREAM],
+            args=[int(time.time() * 1000), self.batch_size],
+        )
+        entries = await self._reclaim()
+        if not entries:
+            reply = await self.redis.xreadgroup(
+                OUTBOX_GROUP,
+                self.consumer,
+                {OUTBOX_STREAM: ">"},
+                count=self.batch_size,
+                block=block_ms,
+            )
+            entries = reply[0][1] if reply else []
+        if entries:
+            await self._process(entries)
+        return len(entries)
+
+    async def _reclaim(self) -> list:
+        """Messages another consumer read but never acked (it likely crashed)"""
+        reply = await self.redis.xautoclaim(
+            OUTBOX_STREAM,
+            OUTBOX_GROUP,
+            self.consumer,
+            min_idle_time=settings.EMAIL_OUTBOX_CLAIM_IDLE_SECONDS * 1000,
+            count=self.batch_size,
+        )
+        # Entries deleted while pending come back without fields
+        return [(entry_id, fields) for entry_id, fields in reply[1] if fields]
+
+    async def _process(self, entries: list) -> None:
+        results = await asyncio.gather(
+            *(
+                self.deliver(
+                    fields["subject"],
+                    json.loads(fields["recipients"]),
+                    fields["body"],
+                    # Absent on messages queued before plain-text bodies existed
+                    fields.get("text_body") or None,
+                )
+                for _, fields in entries
+            ),
+            return_exceptions=True,
+        )
+
+        now_ms = int(time.time() * 1000)
+        sent = retried = dead = 0
+        max_lag_ms = 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for (entry_id, fields), result in zip(entries, results):
+                if not isinstance(result, Exception):
+                    sent += 1
+                    max_lag_ms = max(max_lag_ms, now_ms - int(fields["enqueued_at"]))
+                    continue
+                attempts = int(fields["attempts"]) + 1
+                fields = {**fields, "attempts": attempts, "last_error": str(result)}
+                if attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    dead += 1
+                    pipe.xadd(
+                        OUTBOX_DEAD,
+                        {
+                            field: value
+                            for field, value in fields.items()
+                            if field not in DEAD_LETTER_DROPPED_FIELDS
+                        },
+                        maxlen=settings.EMAIL_OUTBOX_MAX_LENGTH,
+                        approximate=True,
+                    )
+                    logger.error(
+                        f"Email {fields['message_id']} dead-lettered after "
+                        f"{attempts} attempts: {result}"
+                    )
+                else:
+                    retried += 1
+                    retry_at = now_ms + retry_delay_seconds(attempts) * 1000
+                    payload = json.dumps(
+                        [item for pair in fields.items() for item in pair]
+                    )
+                    pipe.zadd(OUTBOX_RETRY, {payload: retry_at})
+                    logger.warning(
+                        f"Email {fields['message_id']} failed (attempt {attempts}), "
+                        f"retrying: {result}"
+                    )
+
+            if dead:
+                # Stream ids start with the ms timestamp, so this trims by age
+                retention_ms = settings.EMAIL_OUTBOX_DEAD_RETENTION_SECONDS * 1000
+                pipe.xtrim(OUTBOX_DEAD, minid=now_ms - retention_ms, approximate=True)
+                pipe.expire(OUTBOX_DEAD, settings.EMAIL_OUTBOX_DEAD_RETENTION_SECONDS)
+
+            entry_ids = [entry_id for entry_id, _ in entries]
+            pipe.xack(OUTBOX_STREAM, OUTBOX_GROUP, *entry_ids)
+            pipe.xdel(OUTBOX_STREAM, *entry_ids)
+
+            sent_key = create_sent_counter_key(now_ms // 60000)
+            pipe.incrby(sent_key, sent)
+            pipe.expire(sent_key, 180)
+            pipe.hincrby(OUTBOX_METRICS, "sent", sent)
+            pipe.hincrby(OUTBOX_METRICS, "retried", retried)
+            pipe.hincrby(OUTBOX_METRICS, "dead_lettered", dead)
+            if sent:
+                pipe.hset(
+                    OUTBOX_METRICS,
+                    mapping={
+                        "last_sent_at": now_ms,
+                        "last_delivery_lag_ms": max_lag_ms,
+                    },
+                )
+            await pipe.execute()
+
+        self.sent += sent
+        self.failed += retried + dead
+
+
+async def outbox_stats(redis_client=None) -> dict:
+    """Backlog, lag and throughput of the outbox, as seen from Redis"""
+    redis_client = redis_client or get_async_redis()
+    now_ms = int(time.time() * 1000)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.xlen(OUTBOX_STREAM)
+        pipe.xpending(OUTBOX_STREAM, OUTBOX_GROUP)
+        pipe.zcard(OUTBOX_RETRY)
+        pipe.xlen(OUTBOX_DEAD)
+        pipe.xrange(OUTBOX_STREAM, count=1)
+        pipe.get(create_sent_counter_key(now_ms // 60000 - 1))
+        pipe.hgetall(OUTBOX_METRICS)
+        backlog, pending, retry_scheduled, dead, oldest, sent_last_minute, metrics = (
+            await pipe.execute(raise_on_error=False)
+        )
+
+    # The oldest undelivered message tells how far behind the workers are
+    oldest_age = 0.0
+    if oldest and not isinstance(oldest, Exception):
+        oldest_age = (now_ms - int(oldest[0][1]["enqueued_at"])) / 1000
+    return {
+        "backlog": backlog,
+        "in_flight": 0 if isinstance(pending, Exception) else pending["pending"],
+        "retry_scheduled": retry_scheduled,
+        "dead_letters": dead,
+        "oldest_message_age_seconds": oldest_age,
+        "sent_per_second": int(sent_last_minute or 0) / 60,
+        "sent": int(metrics.get("sent", 0)),
+        "retried": int(metrics.get("retried", 0)),
+        "dead_lettered": int(metrics.get("dead_lettered", 0)),
+        "last_delivery_lag_ms": int(metrics.get("last_delivery_lag_ms", 0)),
+    }
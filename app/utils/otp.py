@@ -1,7 +1,43 @@
 import random
 import string
-import json
-from datetime import datetime, timedelta, timezone
+from enum import Enum
+from app.core.config import settings
+
+
+class OTPVerification(str, Enum):
+    VALID = "valid"
+    INVALID = "invalid"
+    EXPIRED = "expired"
+    LOCKED = "locked"
+
+
+# OTPs are small Redis hashes: c = code, a = failed attempts so far.
+# Check, count and consume in one atomic step, so a code can be used once
+# and guesses stop after OTP_MAX_ATTEMPTS failures.
+# Returns 1 valid, 0 invalid, -1 missing or expired, -2 locked out.
+CONSUME_OTP_SCRIPT = """
+local code = redis.call('HGET', KEYS[1], 'c')
+if not code then
+    return -1
+end
+if code == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+local attempts = redis.call('HINCRBY', KEYS[1], 'a', 1)
+if attempts >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+    return -2
+end
+return 0
+"""
+
+OTP_RESULTS = {
+    1: OTPVerification.VALID,
+    0: OTPVerification.INVALID,
+    -1: OTPVerification.EXPIRED,
+    -2: OTPVerification.LOCKED,
+}
 
 
 def generate_otp() -> str:
@@ -15,33 +51,25 @@ def get_otp_ttl_seconds() -> int:
 
 
 def create_otp_key(user_id: str) -> str:
-    """Create Redis key for OTP using user_id"""
-    return f"otp:{user_id}"
+    """Create Redis key for OTP using user_id, hash-tagged like the token keys"""
+    return f"otp:{{{user_id}}}"
 
 
-def store_otp_redis(redis_client, user_id: str, otp_code: str) -> None:
-    """Store OTP in Redis with TTL"""
+async def store_otp_redis_async(redis_client, user_id: str, otp_code: str) -> None:
+    """Store OTP in Redis with TTL, resetting the attempt count"""
     key = create_otp_key(user_id)
-    value = json.dumps(
-        {
-            "user_id": user_id,
-            "code": otp_code,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-        }
-    )
-    redis_client.setex(key, get_otp_ttl_seconds(), value)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping={"c": otp_code, "a": 0})
+        pipe.expire(key, get_otp_ttl_seconds())
+        await pipe.execute()
 
 
-def get_otp_redis(redis_client, user_id: str) -> dict | None:
-    """Retrieve OTP from Redis"""
-    key = create_otp_key(user_id)
-    value = redis_client.get(key)
-    if value:
-        return json.loads(value)
-    return None
-
-
-def delete_otp_redis(redis_client, user_id: str) -> None:
-    """Delete OTP from Redis"""
-    key = create_otp_key(user_id)
-    redis_client.delete(key)
+async def consume_otp_redis_async(
+    redis_client, user_id: str, otp_code: str
+) -> OTPVerification:
+    """Check an OTP and consume it if it matches, counting failed attempts"""
+    consume = redis_client.register_script(CONSUME_OTP_SCRIPT)
+    result = await consume(
+        keys=[create_otp_key(user_id)], args=[otp_code, settings.OTP_MAX_ATTEMPTS]
+    )
+    return OTP_RESULTS[int(result)]
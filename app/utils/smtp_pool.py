@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import time
+from email.message import EmailMessage
+
+import aiosmtplib
+
+from app.core.config import settings
+from app.core.metrics import stage_timer
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class PooledConnection:
+    def __init__(self, client: aiosmtplib.SMTP):
+        self.client = client
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Long-lived SMTP connections shared by every send in this process.
+
+    Up to `size` connections are open at once; each carries many messages,
+    so only the first pays TCP connect, EHLO, TLS and login. Connections
+    idle longer than `idle_timeout`, or that have sent
+    `max_messages_per_connection`, are closed rather than reused. A
+    connection the server dropped is replaced and the send retried once.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        idle_timeout: float,
+        max_messages_per_connection: int,
+        connect_options: dict,
+    ):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_messages_per_connection = max_messages_per_connection
+        self.connect_options = connect_options
+        self._idle: list[PooledConnection] = []
+        self._slots = asyncio.Semaphore(size)
+        self._closed = False
+        self.in_use = 0
+        self.connects = 0
+        self.reuses = 0
+        self.reconnects = 0
+        self.sent = 0
+        self.failed = 0
+
+    async def send(self, message: EmailMessage) -> None:
+        """Send `message` on a pooled connection, raising if it was not accepted"""
+        if self._closed:
+            raise RuntimeError("SMTP connection pool is closed")
+        async with self._slots:
+            self.in_use += 1
+            try:
+                with stage_timer("email", "smtp.send"):
+                    await self._send(message)
+            finally:
+                self.in_use -= 1
+
+    async def _send(self, message: EmailMessage) -> None:
+        try:
+            connection = await self._checkout()
+        except Exception:
+            self.failed += 1
+            raise
+        try:
+            try:
+                await connection.client.send_message(message)
+            except (aiosmtplib.SMTPServerDisconnected, ConnectionError) as e:
+                # Most likely the server closed an idle connection
+                logger.warning(f"SMTP connection lost, reconnecting: {e}")
+                await self._discard(connection)
+                self.reconnects += 1
+                connection = await self._connect()
+                await connection.client.send_message(message)
+        except Exception:
+            self.failed += 1
+            await self._release(connection)
+            raise
+        connection.messages_sent += 1
+        self.sent += 1
+        await self._release(connection)
+
+    async def _checkout(self) -> PooledConnection:
+        now = time.monotonic()
+        while self._idle:
+            connection = self._idle.pop()
+            if (
+                now - connection.last_used < self.idle_timeout
+                and connection.client.is_connected
+            ):
+                self.reuses += 1
+                return connection
+            await self._discard(connection)
+        return await self._connect()
+
+    async def _connect(self) -> PooledConnection:
+        client = aiosmtplib.SMTP(**self.connect_options)
+        await client.connect()
+        self.connects += 1
+        return PooledConnection(client)
+
+    async def _release(self, connection: PooledConnection) -> None:
+        if (
+            self._closed
+            or not connection.client.is_connected
+            or connection.messages_sent >= self.max_messages_per_connection
+        ):
+            await self._discard(connection)
+            return
+        connection.last_used = time.monotonic()
+        # Most recently used last: it is popped first, so spare ones go idle
+        self._idle.append(connection)
+
+    async def _discard(self, connection: PooledConnection) -> None:
+        if not connection.client.is_connected:
+            return
+        try:
+            await connection.client.quit()
+        except Exception:
+            connection.client.close()
+
+    async def close(self) -> None:
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            await self._discard(connection)
+        if idle:
+            logger.info("SMTP connection pool closed.")
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "idle": len(self._idle),
+            "connects": self.connects,
+            "reuses": self.reuses,
+            "reconnects": self.reconnects,
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+
+
+def smtp_connect_options() -> dict:
+    options = {
+        "hostname": settings.MAIL_HOST,
+        "port": settings.MAIL_PORT,
+        "use_tls": settings.MAIL_SSL_TLS,
+        "start_tls": settings.MAIL_STARTTLS,
+        "timeout": settings.MAIL_TIMEOUT_SECONDS,
+    }
+    if settings.MAIL_USERNAME:
+        options["username"] = settings.MAIL_USERNAME
+        options["password"] = settings.MAIL_PASSWORD
+    return options
+
+
+smtp_pool: SMTPConnectionPool | None = None
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    """This process's SMTP pool, created on first use"""
+    global smtp_pool
+    if smtp_pool is None:
+        smtp_pool = SMTPConnectionPool(
+            size=settings.MAIL_POOL_SIZE,
+            idle_timeout=settings.MAIL_POOL_IDLE_TIMEOUT_SECONDS,
+            max_messages_per_connection=settings.MAIL_POOL_MAX_MESSAGES_PER_CONNECTION,
+            connect_options=smtp_connect_options(),
+        )
+    return smtp_pool
+
+
+async def close_smtp_pool() -> None:
+    global smtp_pool
+    if smtp_pool is not None:
+        await smtp_pool.close()
+        smtp_pool = None
@@ -1,46 +1,249 @@
-import json
+import logging
+import time
+from enum import Enum
 from app.core.config import settings
+from app.core.redis import (
+    get_async_redis,
+    get_async_redis_reader,
+)
+from app.core.security import invalidate_cached_tokens
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger("uvicorn.error")
+
+# Every write publishes the user id here so other processes drop their copies
+TOKEN_INVALIDATION_CHANNEL = "token:invalidate"
 
 
 def create_token_keys(user_id: str):
-    """Create Redis keys for access and refresh tokens"""
+    """
+    Create Redis keys for access and refresh tokens. The {user_id} hash tag
+    puts both (and the user's OTP) in one cluster slot, so the multi-key
+    scripts below stay valid on Redis Cluster.
+    """
     return {
-        "access": f"token:{user_id}:access",
-        "refresh": f"token:{user_id}:refresh",
+        "access": f"token:{{{user_id}}}:access",
+        "refresh": f"token:{{{user_id}}}:refresh",
     }
 
 
-def store_tokens_redis(
-    redis_client, user_id: str, access_token: str, refresh_token: str
-) -> None:
-    """Store access and refresh tokens in Redis with appropriate TTLs"""
-    keys = create_token_keys(user_id)
+def get_token_ttls() -> tuple[int, int]:
+    """Access and refresh token TTLs in seconds"""
+    return (
+        settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
+    )
 
-    access_ttl = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
-    redis_client.setex(keys["access"], access_ttl, access_token)
 
-    refresh_ttl = settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
-    redis_client.setex(keys["refresh"], refresh_ttl, refresh_token)
+# Both tokens, or nothing: an access token outliving its refresh token is dropped.
+# Also returns the remaining PTTL of what was read, so caches never outlive it.
+FETCH_TOKENS_SCRIPT = """
+local refresh = redis.call('GET', KEYS[2])
+if not refresh then
+    redis.call('DEL', KEYS[1])
+    return false
+end
+local access = redis.call('GET', KEYS[1])
+local ttl
+if access then
+    ttl = redis.call('PTTL', KEYS[1])
+else
+    ttl = redis.call('PTTL', KEYS[2])
+end
+return {access, refresh, ttl}
+"""
 
+# Writes are scripts rather than MULTI pipelines so PUBLISH (which has no key)
+# can ride along in the same round trip on Redis Cluster too
+STORE_TOKENS_SCRIPT = """
+redis.call('SETEX', KEYS[1], ARGV[3], ARGV[1])
+redis.call('SETEX', KEYS[2], ARGV[4], ARGV[2])
+redis.call('PUBLISH', ARGV[5], ARGV[6])
+return 1
+"""
 
-def get_tokens_redis(redis_client, user_id: str) -> dict | None:
-    keys = create_token_keys(user_id)
+REVOKE_TOKENS_SCRIPT = """
+redis.call('DEL', KEYS[1], KEYS[2])
+redis.call('PUBLISH', ARGV[1], ARGV[2])
+return 1
+"""
 
-    refresh_token = redis_client.get(keys["refresh"])
+# Swap both tokens only if the presented refresh token is still the stored one
+ROTATE_TOKENS_SCRIPT = """
+local stored = redis.call('GET', KEYS[2])
+if not stored then
+    return -1
+end
+if stored ~= ARGV[1] then
+    return 0
+end
+redis.call('SETEX', KEYS[1], ARGV[4], ARGV[2])
+redis.call('SETEX', KEYS[2], ARGV[5], ARGV[3])
+redis.call('PUBLISH', ARGV[6], ARGV[7])
+return 1
+"""
 
-    if not refresh_token:
-        delete_tokens_redis(redis_client, user_id)
-        return None
 
-    access_token = redis_client.get(keys["access"])
+class TokenRotation(str, Enum):
+    ROTATED = "rotated"
+    NO_SESSION = "no_session"
+    REUSED = "reused"
+
+
+# Rotation returns 1 rotated, 0 a different refresh token is stored (replay),
+# -1 nothing is stored (expired, logged out or reset)
+ROTATION_RESULTS = {
+    1: TokenRotation.ROTATED,
+    0: TokenRotation.REUSED,
+    -1: TokenRotation.NO_SESSION,
+}
+
 
+def _tokens_from_reply(reply) -> dict | None:
+    if not reply:
+        return None
+    access_token, refresh_token = reply[0], reply[1]
     if not access_token:
         return {"refresh_token": refresh_token}
-
     return {"access_token": access_token, "refresh_token": refresh_token}
 
 
-def delete_tokens_redis(redis_client, user_id: str) -> None:
-    """Delete both access and refresh tokens from Redis"""
-    keys = create_token_keys(user_id)
-    redis_client.delete(keys["access"], keys["refresh"])
+class TokenStore:
+    """
+    Per-user access/refresh tokens in Redis.
+
+    Every operation is a single round trip run as a server-side Lua script.
+    With a separate reader (replicas), fetch instead reads through one
+    pipeline on the replica, since scripts there must not write.
+
+    With a near cache, fetched tokens are kept in-process until the sooner of
+    the near-cache TTL and the key's own Redis TTL. Each write publishes the
+    user id on TOKEN_INVALIDATION_CHANNEL in the same round trip, and every
+    process drops that user's entry when it hears it.
+    """
+
+    def __init__(self, redis_client, near_cache: TTLCache | None = None, reader=None):
+        self.redis = redis_client
+        self.near_cache = near_cache
+        self.reader = reader if reader is not redis_client else None
+        self._store = redis_client.register_script(STORE_TOKENS_SCRIPT)
+        self._fetch = redis_client.register_script(FETCH_TOKENS_SCRIPT)
+        self._rotate = redis_client.register_script(ROTATE_TOKENS_SCRIPT)
+        self._revoke = redis_client.register_script(REVOKE_TOKENS_SCRIPT)
+
+    def _forget(self, user_id: str) -> None:
+        if self.near_cache is not None:
+            self.near_cache.invalidate_tag(user_id)
+
+    async def store(self, user_id: str, access_token: str, refresh_token: str) -> None:
+        """Store access and refresh tokens with their TTLs"""
+        keys = create_token_keys(user_id)
+        access_ttl, refresh_ttl = get_token_ttls()
+        self._forget(user_id)
+        await self._store(
+            keys=[keys["access"], keys["refresh"]],
+            args=[
+                access_token,
+                refresh_token,
+                access_ttl,
+                refresh_ttl,
+                TOKEN_INVALIDATION_CHANNEL,
+                user_id,
+            ],
+        )
+
+    async def fetch(self, user_id: str) -> dict | None:
+        """Return the user's stored tokens, or None without a refresh token"""
+        if self.near_cache is not None:
+            cached = self.near_cache.get(user_id)
+            if cached is not None:
+                return dict(cached)
+
+        generation = self.near_cache.generation if self.near_cache else 0
+        keys = create_token_keys(user_id)
+        if self.reader is not None:
+            reply = await self._fetch_from_reader(keys)
+        else:
+            reply = await self._fetch(keys=[keys["access"], keys["refresh"]])
+        tokens = _tokens_from_reply(reply)
+
+        if (
+            tokens
+            and self.near_cache is not None
+            and self.near_cache.generation == generation
+            and reply[2] > 0
+        ):
+            ttl = min(settings.TOKEN_NEAR_CACHE_TTL_SECONDS, reply[2] / 1000)
+            self.near_cache.set(user_id, tokens, time.time() + ttl, tag=user_id)
+            return dict(tokens)
+        return tokens
+
+    async def _fetch_from_reader(self, keys: dict) -> list | None:
+        """Same reply shape as FETCH_TOKENS_SCRIPT, read-only"""
+        async with self.reader.pipeline(transaction=False) as pipe:
+            pipe.get(keys["access"])
+            pipe.get(keys["refresh"])
+            pipe.pttl(keys["access"])
+            pipe.pttl(keys["refresh"])
+            access, refresh, access_ttl, refresh_ttl = await pipe.execute()
+        if not refresh:
+            return None
+        return [access, refresh, access_ttl if access else refresh_ttl]
+
+    async def rotate(
+        self,
+        user_id: str,
+        current_refresh_token: str,
+        access_token: str,
+        refresh_token: str,
+    ) -> TokenRotation:
+        """Atomically replace the tokens if current_refresh_token is the stored one"""
+        keys = create_token_keys(user_id)
+        access_ttl, refresh_ttl = get_token_ttls()
+        self._forget(user_id)
+        rotated = await self._rotate(
+            keys=[keys["access"], keys["refresh"]],
+            args=[
+                current_refresh_token,
+                access_token,
+                refresh_token,
+                access_ttl,
+                refresh_ttl,
+                TOKEN_INVALIDATION_CHANNEL,
+                user_id,
+            ],
+        )
+        return ROTATION_RESULTS[int(rotated)]
+
+    async def revoke(self, user_id: str) -> None:
+        """Delete both tokens"""
+        keys = create_token_keys(user_id)
+        self._forget(user_id)
+        await self._revoke(
+            keys=[keys["access"], keys["refresh"]],
+            args=[TOKEN_INVALIDATION_CHANNEL, user_id],
+        )
+        invalidate_cached_tokens(user_id)
+
+
+# In-process near cache in front of the token store, shared by every TokenStore
+token_near_cache = (
+    TTLCache(maxsize=settings.TOKEN_NEAR_CACHE_SIZE)
+    if settings.TOKEN_NEAR_CACHE_SIZE > 0
+    else None
+)
+
+token_store: TokenStore | None = None
+
+
+def get_token_store() -> TokenStore:
+    """Token store bound to this worker's current async Redis client"""
+    global token_store
+    redis_client = get_async_redis()
+    if token_store is None or token_store.redis is not redis_client:
+        token_store = TokenStore(
+            redis_client,
+            near_cache=token_near_cache,
+            reader=get_async_redis_reader(),
+        )
+    return token_store
@@ -0,0 +1,134 @@
+import json
+import logging
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis import get_async_redis
+from app.queries.user import (
+    UserProfile,
+    get_user_profile_by_email,
+    get_user_profile_by_id,
+)
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger("uvicorn.error")
+
+# Every invalidation publishes the user id here so other processes drop theirs
+USER_INVALIDATION_CHANNEL = "user:invalidate"
+
+
+def create_user_id_key(user_id: str) -> str:
+    """Redis key for a user's profile looked up by id"""
+    return f"user:{{{user_id}}}:profile"
+
+
+def create_user_email_key(email: str) -> str:
+    """Redis key for a user's profile looked up by email"""
+    return f"user:email:{email}"
+
+
+class UserCache:
+    """
+    Read-through cache of UserProfile records, looked up by id or email.
+
+    Two tiers: a small in-process TTLCache with a short TTL, then Redis with
+    a longer one, then the database. A database hit fills both tiers under
+    both keys. Misses (unknown users) are not cached. invalidate() removes
+    the user from Redis and publishes on USER_INVALIDATION_CHANNEL in one
+    round trip, and every process drops its local copy when it hears it.
+    Redis errors fall back to the database rather than failing the request.
+    """
+
+    def __init__(self, redis_client, local: TTLCache | None = None):
+        self.redis = redis_client
+        self.local = local
+
+    async def get_by_id(self, db: AsyncSession, user_id: str) -> UserProfile | None:
+        return await self._get(
+            ("id", user_id),
+            create_user_id_key(user_id),
+            lambda: get_user_profile_by_id(db, user_id),
+        )
+
+    async def get_by_email(self, db: AsyncSession, email: str) -> UserProfile | None:
+        return await self._get(
+            ("email", email),
+            create_user_email_key(email),
+            lambda: get_user_profile_by_email(db, email),
+        )
+
+    async def _get(self, local_key: tuple, redis_key: str, load) -> UserProfile | None:
+        if self.local is not None:
+            cached = self.local.get(local_key)
+            if cached is not None:
+                return cached
+
+        generation = self.local.generation if self.local else 0
+        profile = None
+        if settings.USER_CACHE_TTL_SECONDS > 0:
+            try:
+                cached = await self.redis.get(redis_key)
+                if cached is not None:
+                    profile = UserProfile.from_dict(json.loads(cached))
+            except Exception as e:
+                logger.error(f"User cache read failed for {redis_key}: {e}")
+
+        if profile is None:
+            profile = await load()
+            if profile is None:
+                return None
+            await self._fill_redis(profile)
+
+        if self.local is not None and self.local.generation == generation:
+            expires_at = time.time() + settings.USER_CACHE_LOCAL_TTL_SECONDS
+            for key in (("id", profile.id), ("email", profile.email)):
+                self.local.set(key, profile, expires_at, tag=profile.id)
+        return profile
+
+    async def _fill_redis(self, profile: UserProfile) -> None:
+        if settings.USER_CACHE_TTL_SECONDS <= 0:
+            return
+        value = json.dumps(profile.to_dict())
+        try:
+            # Not a transaction: on Redis Cluster the two keys are in different slots
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in (
+                    create_user_id_key(profile.id),
+                    create_user_email_key(profile.email),
+                ):
+                    pipe.set(key, value, ex=settings.USER_CACHE_TTL_SECONDS)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"User cache fill failed for user_id={profile.id}: {e}")
+
+    async def invalidate(self, user_id: str, email: str) -> None:
+        """Forget a user everywhere; call after any write to their row"""
+        if self.local is not None:
+            self.local.invalidate_tag(user_id)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.delete(create_user_id_key(user_id))
+                pipe.delete(create_user_email_key(email))
+                pipe.publish(USER_INVALIDATION_CHANNEL, user_id)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"User cache invalidation failed for user_id={user_id}: {e}")
+
+
+# In-process tier, shared by every UserCache in this worker
+user_local_cache = (
+    TTLCache(maxsize=settings.USER_CACHE_SIZE) if settings.USER_CACHE_SIZE > 0 else None
+)
+
+user_cache: UserCache | None = None
+
+
+def get_user_cache() -> UserCache:
+    """User cache bound to this worker's current async Redis client"""
+    global user_cache
+    redis_client = get_async_redis()
+    if user_cache is None or user_cache.redis is not redis_client:
+        user_cache = UserCache(redis_client, local=user_local_cache)
+    return user_cache
@@ -0,0 +1,68 @@
+"""native uuid keys for users, customers and admins
+
+Converts users.id, customers.id, admins.id and the customers.user_id /
+admins.user_id foreign keys from VARCHAR to UUID in place. Existing ids were
+generated with uuid4() and cast as they are; new rows get time-ordered
+UUIDv7 ids from app.utils.ids.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 03:41:52.114097
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column) pairs to convert, primary keys first
+UUID_COLUMNS = (
+    ("users", "id"),
+    ("customers", "id"),
+    ("customers", "user_id"),
+    ("admins", "id"),
+    ("admins", "user_id"),
+)
+
+USER_FOREIGN_KEYS = (
+    ("customers_user_id_fkey", "customers"),
+    ("admins_user_id_fkey", "admins"),
+)
+
+
+def convert(to_type, using: str) -> None:
+    # The foreign keys have to go while the referenced column changes type
+    for name, table in USER_FOREIGN_KEYS:
+        op.drop_constraint(name, table, type_="foreignkey")
+
+    for table, column in UUID_COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=to_type,
+            existing_nullable=False,
+            postgresql_using=f"{column}::{using}",
+        )
+
+    for name, table in USER_FOREIGN_KEYS:
+        op.create_foreign_key(
+            name, table, "users", ["user_id"], ["id"], ondelete="CASCADE"
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    convert(sa.Uuid(), "uuid")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    convert(sa.String(), "varchar")
@@ -0,0 +1,125 @@
+"""
+Registration benchmark — round trips and registrations/sec for the
+single-statement insert used by register_user, against the previous
+select-then-insert flow, on the database configured in Settings.
+
+    python scripts/bench_register.py [--iterations N]
+
+A round trip is counted for every statement plus each BEGIN and COMMIT.
+Password hashing and email are left out; both flows do the same work there.
+Users created by the run are deleted afterwards.
+"""
+
+import argparse
+import asyncio
+import pathlib
+import sys
+import time
+import uuid
+
+from sqlalchemy import delete, event, select
+
+repo_root = str(pathlib.Path(__file__).resolve().parent.parent)
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from app.core.database import AsyncSessionLocal, async_engine  # noqa: E402
+from app.schemas.auth import RegisterRequest  # noqa: E402
+from app.schemas.customer import Customer  # noqa: E402
+from app.schemas.user import User  # noqa: E402
+from app.services.auth_service import build_register_statement  # noqa: E402
+from app.utils.ids import uuid7  # noqa: E402
+
+import app.schemas.admin  # noqa: E402,F401
+
+PASSWORD_HASH = "$pbkdf2-sha256$29000$benchmark$benchmark"
+round_trips = 0
+
+
+def count_round_trip(*args, **kwargs):
+    global round_trips
+    round_trips += 1
+
+
+for name in ("before_cursor_execute", "begin", "commit", "rollback"):
+    event.listen(async_engine.sync_engine, name, count_round_trip)
+
+
+async def register_previous(db, data: RegisterRequest) -> None:
+    """The flow register_user used before: check, insert, flush, commit, refresh"""
+    if await db.scalar(select(User).where(User.email == data.email)):
+        raise ValueError("Email already registered")
+    if data.phone and await db.scalar(select(User).where(User.phone == data.phone)):
+        raise ValueError("Phone number already registered")
+    user = User(
+        id=uuid7(),
+        email=data.email,
+        phone=data.phone,
+        password=PASSWORD_HASH,
+        role="customer",
+        is_verified=False,
+    )
+    db.add(user)
+    await db.flush()
+    db.add(
+        Customer(
+            id=uuid7(),
+            user_id=user.id,
+            first_name=data.first_name,
+            last_name=data.last_name,
+        )
+    )
+    await db.commit()
+    await db.refresh(user)
+
+
+async def register_single(db, data: RegisterRequest) -> None:
+    statement = build_register_statement(uuid7(), uuid7(), data, PASSWORD_HASH)
+    await db.execute(statement)
+    await db.commit()
+
+
+async def measure(name: str, register, prefix: str, iterations: int) -> float:
+    global round_trips
+    requests = [
+        RegisterRequest(
+            email=f"{prefix}-{name}-{i}@bench.example.com",
+            phone=f"+{prefix[:6]}{i}",
+            password="benchmark-password",
+            first_name="Bench",
+            last_name=name,
+        )
+        for i in range(iterations)
+    ]
+    round_trips = 0
+    started = time.perf_counter()
+    for data in requests:
+        async with AsyncSessionLocal() as db:
+            await register(db, data)
+    elapsed = time.perf_counter() - started
+    per_op = round_trips / iterations
+    print(
+        f"{name:<9} {per_op:>5.2f} round trips/registration   "
+        f"{iterations / elapsed:>8,.0f} registrations/s"
+    )
+    return per_op
+
+
+async def main(iterations: int):
+    prefix = uuid.uuid4().hex[:12]
+    try:
+        previous = await measure("previous", register_previous, prefix, iterations)
+        single = await measure("single", register_single, prefix, iterations)
+        print(f"round trips saved per registration: {previous - single:.2f}")
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(User).where(User.email.like(f"{prefix}-%")))
+            await db.commit()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark user registration")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,119 @@
+"""
+SMTP benchmark — messages/sec with a fresh connection per message (what
+send_email did before the pool) against the pooled connections in
+app/utils/smtp_pool.py, using a local stand-in SMTP server.
+
+    python scripts/bench_smtp.py [--messages N] [--concurrency C]
+                                 [--handshake-ms MS]
+
+The stand-in server accepts everything and delays its greeting by
+--handshake-ms, to stand for the TCP and TLS setup a real mail server costs.
+"""
+
+import argparse
+import asyncio
+import pathlib
+import sys
+import time
+
+import aiosmtplib
+
+repo_root = str(pathlib.Path(__file__).resolve().parent.parent)
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from app.utils.email import build_email_message  # noqa: E402
+from app.utils.smtp_pool import SMTPConnectionPool  # noqa: E402
+
+HOST = "127.0.0.1"
+
+
+class StandInSMTPServer:
+    """Just enough SMTP to accept mail: every command succeeds"""
+
+    def __init__(self, handshake_ms: float):
+        self.handshake_ms = handshake_ms
+        self.connections = 0
+        self.messages = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        await asyncio.sleep(self.handshake_ms / 1000)
+        writer.write(b"220 stand-in ESMTP\r\n")
+        in_data = False
+        while line := await reader.readline():
+            if in_data:
+                if line == b".\r\n":
+                    in_data = False
+                    self.messages += 1
+                    writer.write(b"250 OK queued\r\n")
+                continue
+            command = line[:4].upper()
+            if command == b"EHLO":
+                writer.write(b"250-stand-in\r\n250 8BITMIME\r\n")
+            elif command == b"DATA":
+                in_data = True
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+
+async def run(send, messages: int, concurrency: int) -> float:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with slots:
+            await send(
+                build_email_message(
+                    f"Benchmark {i}", [f"user{i}@example.com"], "<p>Hello</p>"
+                )
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(messages)))
+    return time.perf_counter() - started
+
+
+async def main(messages: int, concurrency: int, handshake_ms: float):
+    server = StandInSMTPServer(handshake_ms)
+    listener = await asyncio.start_server(server.handle, HOST, 0)
+    port = listener.sockets[0].getsockname()[1]
+
+    async def send_fresh(message):
+        await aiosmtplib.send(message, hostname=HOST, port=port, start_tls=False)
+
+    pool = SMTPConnectionPool(
+        size=concurrency,
+        idle_timeout=30,
+        max_messages_per_connection=messages,
+        connect_options={"hostname": HOST, "port": port, "start_tls": False},
+    )
+
+    results = {}
+    for name, send in (("fresh", send_fresh), ("pooled", pool.send)):
+        server.connections = 0
+        elapsed = await run(send, messages, concurrency)
+        results[name] = messages / elapsed
+        print(
+            f"{name:<7} {results[name]:>8,.0f} messages/s   "
+            f"{server.connections:>5} connections"
+        )
+    await pool.close()
+    listener.close()
+    await listener.wait_closed()
+    print(f"pooled vs fresh: {results['pooled'] / results['fresh']:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SMTP delivery")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--handshake-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.concurrency, args.handshake_ms))
@@ -0,0 +1,86 @@
+"""
+Token store benchmark — round trips and ops/sec for each TokenStore operation
+against the Redis configured in Settings (REDIS_HOST / REDIS_PORT).
+
+    python scripts/bench_token_store.py [--iterations N]
+
+A round trip is one packed write to the socket followed by its replies, so a
+pipeline or an EVALSHA counts once however many commands it carries.
+"""
+
+import argparse
+import asyncio
+import pathlib
+import sys
+import time
+import uuid
+
+from redis.asyncio.connection import AbstractConnection
+
+repo_root = str(pathlib.Path(__file__).resolve().parent.parent)
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from app.core.redis import close_async_redis, get_async_redis  # noqa: E402
+from app.utils.token_storage import TokenStore  # noqa: E402
+
+round_trips = 0
+_send_packed_command = AbstractConnection.send_packed_command
+
+
+async def counting_send_packed_command(self, command, check_health=True):
+    global round_trips
+    round_trips += 1
+    return await _send_packed_command(self, command, check_health)
+
+
+AbstractConnection.send_packed_command = counting_send_packed_command
+
+
+async def measure(name: str, operation, iterations: int) -> int:
+    global round_trips
+    # The first call may load a Lua script; measure from the second onwards
+    await operation(0)
+    round_trips = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        await operation(i)
+    elapsed = time.perf_counter() - started
+    per_op = round_trips / iterations
+    print(
+        f"{name:<8} {per_op:>5.2f} round trips/op   {iterations / elapsed:>10,.0f} ops/s"
+    )
+    return per_op
+
+
+async def main(iterations: int):
+    store = TokenStore(get_async_redis())
+    user_ids = [f"bench-{uuid.uuid4().hex}" for _ in range(iterations)]
+    access, refresh = "a" * 200, "r" * 220
+
+    results = {
+        "store": await measure(
+            "store", lambda i: store.store(user_ids[i], access, refresh), iterations
+        ),
+        "fetch": await measure("fetch", lambda i: store.fetch(user_ids[i]), iterations),
+        "rotate": await measure(
+            "rotate",
+            lambda i: store.rotate(user_ids[i], refresh, access, refresh),
+            iterations,
+        ),
+        "revoke": await measure(
+            "revoke", lambda i: store.revoke(user_ids[i]), iterations
+        ),
+    }
+    await close_async_redis()
+
+    slow = {name: trips for name, trips in results.items() if trips != 1}
+    if slow:
+        sys.exit(f"Expected exactly one round trip per operation, got {slow}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Redis token store")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
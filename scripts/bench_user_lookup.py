@@ -0,0 +1,82 @@
+"""
+User lookup benchmark — lookups/sec for a full ORM User query, the
+column-projected statements in app/queries/user.py and a raw asyncpg
+fetchrow, on the database configured in Settings.
+
+    python scripts/bench_user_lookup.py [--email EMAIL] [--iterations N]
+
+The email must belong to an existing user; the seeded admin is the default.
+"""
+
+import argparse
+import asyncio
+import pathlib
+import sys
+import time
+
+from sqlalchemy import select
+
+repo_root = str(pathlib.Path(__file__).resolve().parent.parent)
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from app.core.database import AsyncSessionLocal, async_engine  # noqa: E402
+from app.queries.user import get_user_by_email  # noqa: E402
+from app.schemas.user import User  # noqa: E402
+
+import app.schemas.admin  # noqa: E402,F401
+import app.schemas.customer  # noqa: E402,F401
+
+
+async def orm_lookup(db, email: str):
+    return await db.scalar(select(User).where(User.email == email))
+
+
+async def record_lookup(db, email: str):
+    return await get_user_by_email(db, email)
+
+
+async def raw_lookup(db, email: str):
+    connection = await db.connection()
+    raw = (await connection.get_raw_connection()).driver_connection
+    return await raw.fetchrow(
+        "SELECT id, email, role, password FROM users WHERE email = $1", email
+    )
+
+
+async def measure(name: str, lookup, email: str, iterations: int) -> float:
+    async with AsyncSessionLocal() as db:
+        if await lookup(db, email) is None:
+            sys.exit(f"No user with email {email}")
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await lookup(db, email)
+            # A fresh identity map each time, as every request gets
+            db.expunge_all()
+        elapsed = time.perf_counter() - started
+    per_lookup_us = elapsed / iterations * 1_000_000
+    print(
+        f"{name:<7} {iterations / elapsed:>9,.0f} lookups/s   {per_lookup_us:>7.1f} µs/lookup"
+    )
+    return per_lookup_us
+
+
+async def main(email: str, iterations: int):
+    try:
+        orm = await measure("orm", orm_lookup, email, iterations)
+        record = await measure("record", record_lookup, email, iterations)
+        raw = await measure("raw", raw_lookup, email, iterations)
+        print(
+            f"record vs orm: {orm / record:.2f}x faster, "
+            f"{record - raw:.1f} µs over the raw driver call"
+        )
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark user lookups")
+    parser.add_argument("--email", default="admin@example.com")
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.email, args.iterations))
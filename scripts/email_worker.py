@@ -0,0 +1,43 @@
+"""
+Email outbox worker — delivers the emails the API queues on the Redis
+outbox stream, with batching, retries with backoff and dead-lettering.
+Run as many as needed; they share the stream through a consumer group.
+
+    python scripts/email_worker.py
+
+Stops cleanly on SIGINT / SIGTERM after finishing the batch in hand.
+"""
+
+import asyncio
+import logging
+import pathlib
+import signal
+import sys
+
+repo_root = str(pathlib.Path(__file__).resolve().parent.parent)
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from app.core.redis import close_async_redis, get_async_redis  # noqa: E402
+from app.utils.email_outbox import EmailOutboxWorker  # noqa: E402
+from app.utils.smtp_pool import close_smtp_pool  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker = EmailOutboxWorker(get_async_redis())
+    try:
+        await worker.run(stop)
+    finally:
+        await close_smtp_pool()
+        await close_async_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+Token key migration — moves sessions stored under the old untagged keys
+(token:<user_id>:access / :refresh) to the hash-tagged keys the app now
+uses (token:{<user_id>}:access / :refresh), keeping their TTLs. Without it,
+every user logged in before the upgrade has to log in again.
+
+    python scripts/migrate_token_keys.py
+
+Run it once, right after deploying. It is safe to run again: a user who has
+already logged in under the new key keeps that session and the old key is
+dropped. Only standalone and Sentinel deployments can hold old keys.
+"""
+
+import asyncio
+import logging
+import pathlib
+import sys
+
+repo_root = str(pathlib.Path(__file__).resolve().parent.parent)
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from app.core.redis import (  # noqa: E402
+    close_async_redis,
+    get_async_redis,
+    is_redis_cluster,
+)
+from app.utils.token_storage import create_token_keys  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def legacy_key_parts(key: str) -> tuple[str, str] | None:
+    """(user_id, "access" | "refresh") for an old untagged key, else None"""
+    prefix, _, rest = key.partition(":")
+    user_id, _, kind = rest.rpartition(":")
+    if prefix != "token" or "{" in user_id or kind not in ("access", "refresh"):
+        return None
+    return user_id, kind
+
+
+async def main():
+    if is_redis_cluster():
+        logger.info("Redis Cluster never held the old untagged keys; nothing to do")
+        return
+
+    redis_client = get_async_redis()
+    moved = superseded = 0
+    try:
+        async for key in redis_client.scan_iter(match="token:*", count=1000):
+            parts = legacy_key_parts(key)
+            if parts is None:
+                continue
+            user_id, kind = parts
+            # RENAME keeps the TTL; NX leaves a newer session under the new key
+            if await redis_client.renamenx(key, create_token_keys(user_id)[kind]):
+                moved += 1
+            else:
+                await redis_client.delete(key)
+                superseded += 1
+        logger.info(
+            f"Moved {moved} token key(s) to the hash-tagged format, "
+            f"dropped {superseded} already superseded"
+        )
+    finally:
+        await close_async_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
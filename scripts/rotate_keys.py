@@ -0,0 +1,96 @@
+"""
+Token signing key rotation — writes a new EdDSA or RS256 private key into
+JWT_KEYS_DIR, and optionally prunes the oldest keys.
+
+    python scripts/rotate_keys.py [--algorithm EdDSA|RS256] [--keep N]
+
+The new key is published in the JWKS on the next key ring reload, but only
+starts signing once it is JWKS_MAX_AGE_SECONDS + JWT_KEYS_RELOAD_SECONDS
+old, so services with a cached JWKS have picked it up first. Until then the
+previous key keeps signing, and --keep never prunes it.
+
+Keep enough old keys to cover the longest token lifetime (refresh tokens,
+REFRESH_TOKEN_EXPIRE_DAYS) so tokens they signed keep verifying.
+"""
+
+import argparse
+import logging
+import os
+import pathlib
+import sys
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+repo_root = str(pathlib.Path(__file__).resolve().parent.parent)
+if repo_root not in sys.path:
+    sys.path.insert(0, repo_root)
+
+from app.core.config import settings  # noqa: E402
+from app.core.keys import key_activation_delay  # noqa: E402
+
+logger = logging.getLogger("cartify.keys")
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+
+def generate_private_key(algorithm: str):
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def write_key(directory: pathlib.Path, algorithm: str) -> pathlib.Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    kid = f"{time.strftime('%Y%m%d%H%M%S', time.gmtime())}-{os.urandom(4).hex()}"
+    pem = generate_private_key(algorithm).private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    path = directory / f"{kid}.pem"
+    # Write under a temp name so a reloading worker never reads half a key
+    tmp_path = directory / f".{kid}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(pem)
+    os.replace(tmp_path, path)
+    return path
+
+
+def prune_keys(directory: pathlib.Path, keep: int) -> None:
+    """Keep the `keep` newest active keys, plus any not yet active"""
+    activated_before = time.time() - key_activation_delay()
+    paths = sorted(directory.glob("*.pem"), key=lambda p: p.stat().st_mtime)
+    active = [p for p in paths if p.stat().st_mtime <= activated_before]
+    for path in active[: max(0, len(active) - keep)]:
+        path.unlink()
+        logger.info("Removed retired key %s", path.stem)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rotate token signing keys")
+    parser.add_argument(
+        "--algorithm",
+        choices=["EdDSA", "RS256"],
+        default=settings.ALGORITHM if settings.ALGORITHM != "HS256" else "EdDSA",
+    )
+    parser.add_argument("--dir", default=settings.JWT_KEYS_DIR)
+    parser.add_argument("--keep", type=int, default=0, help="prune to N newest keys")
+    args = parser.parse_args()
+
+    directory = pathlib.Path(args.dir)
+    path = write_key(directory, args.algorithm)
+    logger.info(
+        "Created %s key %s; it signs once it is %.0fs old",
+        args.algorithm,
+        path.stem,
+        key_activation_delay(),
+    )
+
+    if args.keep:
+        prune_keys(directory, args.keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 import logging
-import uuid
 
-from app.core.database import SessionLocal, Base, engine
+from app.core.database import SessionLocal
 from app.core.security import hash_password
+from app.utils.ids import uuid7
 from app.schemas.user import User
 from app.schemas.admin import Admin
 from app.schemas.customer import Customer
@@ -29,7 +29,7 @@ def create_user_if_missing(
         db.commit()
         return existing
 
-    user_id = str(uuid.uuid4())
+    user_id = uuid7()
     user = User(
         id=user_id,
         email=email,
@@ -52,7 +52,7 @@ def create_admin_profile_if_missing(
         logger.info(f"Admin profile for {user.email} already exists.")
         return existing
 
-    admin_id = str(uuid.uuid4())
+    admin_id = uuid7()
     admin = Admin(
         id=admin_id,
         user_id=user.id,
@@ -73,7 +73,7 @@ def create_customer_profile_if_missing(
         logger.info(f"Customer profile for {user.email} already exists.")
         return existing
 
-    customer_id = str(uuid.uuid4())
+    customer_id = uuid7()
     customer = Customer(
         id=customer_id,
         user_id=user.id,
@@ -89,8 +89,6 @@ def create_customer_profile_if_missing(
 def seed():
     db = SessionLocal()
     try:
-        Base.metadata.create_all(bind=engine)
-
         admin_user = create_user_if_missing(
             db,
             email="admin@example.com",